@@ -0,0 +1,415 @@
+"""
+Teste de carga local da API
+
+Sobe um servidor uvicorn local (ou usa um já em execução com --url), envia
+uma mistura configurável de requisições para /upload, /process, /preview,
+/histogram e /batch-process com N clientes concorrentes e gera um relatório
+com percentis de latência, taxa de erro, vazão, RSS e CPU do servidor.
+
+As imagens de teste são as de backend/images mais imagens sintéticas
+geradas na hora. O relatório pode ser salvo em JSON (--saida) e comparado
+com uma execução anterior (--comparar).
+
+Uso:
+    python benchmarks/carga.py --concorrencia 8 --duracao 30
+    python benchmarks/carga.py --producao --workers 4 --saida antes.json
+    python benchmarks/carga.py --mix "process=5,preview=5" --comparar antes.json
+"""
+
+import argparse
+import http.client
+import io
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import threading
+import time
+import urllib.parse
+import uuid
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import numpy as np
+from PIL import Image
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+IMAGES_DIR = BACKEND_DIR / 'images'
+
+MIX_PADRAO = {'upload': 1, 'process': 3, 'preview': 3, 'histogram': 2, 'batch-process': 1}
+
+
+def imagens_sinteticas(quantidade: int, semente: int = 42):
+    rng = np.random.default_rng(semente)
+    imagens = []
+    tamanhos = [(640, 480), (1280, 720), (1920, 1080)]
+    for i in range(quantidade):
+        largura, altura = tamanhos[rng.integers(len(tamanhos))]
+        gradiente = np.linspace(0, 255, largura, dtype=np.float32)[None, :, None]
+        ruido = rng.normal(0, 25, (altura, largura, 3)).astype(np.float32)
+        array = np.clip(gradiente + ruido, 0, 255).astype(np.uint8)
+        buffer = io.BytesIO()
+        formato = 'JPEG' if i % 2 == 0 else 'PNG'
+        Image.fromarray(array).save(buffer, formato)
+        imagens.append((f"sintetica_{i}.{formato.lower()}", buffer.getvalue(), f"image/{formato.lower()}"))
+    return imagens
+
+
+def imagens_amostra():
+    imagens = []
+    for caminho in sorted(IMAGES_DIR.iterdir()):
+        if caminho.suffix.lower() in ('.jpg', '.jpeg', '.png'):
+            tipo = 'image/png' if caminho.suffix.lower() == '.png' else 'image/jpeg'
+            imagens.append((caminho.name, caminho.read_bytes(), tipo))
+    return imagens
+
+
+def multipart(campos: dict, arquivos: list):
+    fronteira = uuid.uuid4().hex
+    partes = []
+    for nome, valor in campos.items():
+        partes.append(
+            f'--{fronteira}\r\nContent-Disposition: form-data; name="{nome}"\r\n\r\n{valor}\r\n'.encode()
+        )
+    for campo, nome_arquivo, dados, tipo in arquivos:
+        partes.append(
+            f'--{fronteira}\r\nContent-Disposition: form-data; name="{campo}"; filename="{nome_arquivo}"\r\n'
+            f'Content-Type: {tipo}\r\n\r\n'.encode() + dados + b'\r\n'
+        )
+    partes.append(f'--{fronteira}--\r\n'.encode())
+    return b''.join(partes), f'multipart/form-data; boundary={fronteira}'
+
+
+class Cliente:
+    """Conexão HTTP keep-alive por thread."""
+
+    def __init__(self, url: str):
+        self.alvo = urllib.parse.urlparse(url)
+        self._local = threading.local()
+
+    def _conexao(self):
+        if getattr(self._local, 'conexao', None) is None:
+            self._local.conexao = http.client.HTTPConnection(self.alvo.hostname, self.alvo.port, timeout=120)
+        return self._local.conexao
+
+    def requisitar(self, metodo: str, caminho: str, corpo: bytes = None, tipo: str = None):
+        cabecalhos = {'Content-Type': tipo} if tipo else {}
+        conexao = self._conexao()
+        try:
+            conexao.request(metodo, caminho, body=corpo, headers=cabecalhos)
+            resposta = conexao.getresponse()
+            dados = resposta.read()
+            return resposta.status, dados
+        except (OSError, http.client.HTTPException):
+            conexao.close()
+            self._local.conexao = None
+            raise
+
+
+class GeradorCarga:
+
+    def __init__(self, cliente: Cliente, imagens: list, mix: dict):
+        self.cliente = cliente
+        self.imagens = imagens
+        self.operacoes = list(mix)
+        self.pesos = [mix[op] for op in self.operacoes]
+        self.ids = []
+        self.ids_lock = threading.Lock()
+        self.latencias = defaultdict(list)
+        self.erros = defaultdict(int)
+        self.resultados_lock = threading.Lock()
+
+    def upload(self):
+        nome, dados, tipo = random.choice(self.imagens)
+        corpo, content_type = multipart({}, [('file', nome, dados, tipo)])
+        status, resposta = self.cliente.requisitar('POST', '/upload', corpo, content_type)
+        if status == 200:
+            with self.ids_lock:
+                self.ids.append(json.loads(resposta)['id'])
+        return status
+
+    def _id_aleatorio(self):
+        with self.ids_lock:
+            return random.choice(self.ids)
+
+    def process(self):
+        corpo, tipo = multipart({
+            'brightness': round(random.uniform(0.5, 1.5), 2),
+            'contrast': round(random.uniform(0.5, 1.5), 2),
+            'saturation': round(random.uniform(0.5, 1.5), 2),
+        }, [])
+        return self.cliente.requisitar('POST', f'/process/{self._id_aleatorio()}', corpo, tipo)[0]
+
+    def preview(self):
+        return self.cliente.requisitar('GET', f'/preview/{self._id_aleatorio()}?processed=false')[0]
+
+    def histogram(self):
+        return self.cliente.requisitar('GET', f'/histogram/{self._id_aleatorio()}')[0]
+
+    def batch_process(self):
+        arquivos = [('files', nome, dados, tipo) for nome, dados, tipo in random.sample(self.imagens, min(4, len(self.imagens)))]
+        corpo, tipo = multipart({'brightness': 1.2, 'contrast': 1.1}, arquivos)
+        status, resposta = self.cliente.requisitar('POST', '/batch-process', corpo, tipo)
+        if status == 200:
+            with self.ids_lock:
+                self.ids.extend(r['id'] for r in json.loads(resposta)['results'])
+        return status
+
+    def executar_uma(self):
+        operacao = random.choices(self.operacoes, self.pesos)[0]
+        funcao = getattr(self, operacao.replace('-', '_'))
+        inicio = time.perf_counter()
+        try:
+            status = funcao()
+        except Exception:
+            status = None
+        duracao = (time.perf_counter() - inicio) * 1000
+        with self.resultados_lock:
+            self.latencias[operacao].append(duracao)
+            if status != 200:
+                self.erros[operacao] += 1
+
+    def rodar(self, concorrencia: int, duracao: float):
+        fim = time.perf_counter() + duracao
+
+        def cliente_loop():
+            while time.perf_counter() < fim:
+                self.executar_uma()
+
+        with ThreadPoolExecutor(max_workers=concorrencia) as executor:
+            for _ in range(concorrencia):
+                executor.submit(cliente_loop)
+
+
+class MonitorRecursos:
+    """Amostra RSS e CPU do processo servidor (e filhos, no modo multi-worker)."""
+
+    def __init__(self, pid: int, intervalo: float = 0.5):
+        self.pid = pid
+        self.intervalo = intervalo
+        self.rss_mb = []
+        self.cpu_percent = []
+        self._parar = threading.Event()
+        self._thread = threading.Thread(target=self._loop, daemon=True)
+
+    def _processos(self):
+        processo = psutil.Process(self.pid)
+        return [processo] + processo.children(recursive=True)
+
+    def _loop(self):
+        if psutil is None:
+            return
+        processos = {}
+        while not self._parar.wait(self.intervalo):
+            try:
+                atuais = self._processos()
+            except psutil.NoSuchProcess:
+                return
+            rss = 0
+            cpu = 0.0
+            for processo in atuais:
+                try:
+                    if processo.pid not in processos:
+                        processos[processo.pid] = processo
+                        processo.cpu_percent(None)
+                        continue
+                    rss += processo.memory_info().rss
+                    cpu += processos[processo.pid].cpu_percent(None)
+                except psutil.NoSuchProcess:
+                    continue
+            self.rss_mb.append(rss / (1024 * 1024))
+            self.cpu_percent.append(cpu)
+
+    def iniciar(self):
+        self._thread.start()
+
+    def parar(self):
+        self._parar.set()
+        self._thread.join()
+
+    def resumo(self):
+        if not self.rss_mb:
+            return None
+        return {
+            'rss_mb_pico': round(max(self.rss_mb), 1),
+            'rss_mb_medio': round(sum(self.rss_mb) / len(self.rss_mb), 1),
+            'cpu_percent_medio': round(sum(self.cpu_percent) / len(self.cpu_percent), 1),
+            'cpu_percent_pico': round(max(self.cpu_percent), 1),
+        }
+
+
+def percentil(valores, p):
+    return float(np.percentile(valores, p)) if valores else 0.0
+
+
+def montar_relatorio(gerador: GeradorCarga, duracao: float, concorrencia: int, recursos):
+    endpoints = {}
+    total = 0
+    total_erros = 0
+    for operacao, latencias in sorted(gerador.latencias.items()):
+        erros = gerador.erros[operacao]
+        total += len(latencias)
+        total_erros += erros
+        endpoints[operacao] = {
+            'requisicoes': len(latencias),
+            'erros': erros,
+            'taxa_erro': round(erros / len(latencias), 4),
+            'req_por_s': round(len(latencias) / duracao, 2),
+            'p50_ms': round(percentil(latencias, 50), 1),
+            'p95_ms': round(percentil(latencias, 95), 1),
+            'p99_ms': round(percentil(latencias, 99), 1),
+            'max_ms': round(max(latencias), 1),
+        }
+    return {
+        'concorrencia': concorrencia,
+        'duracao_s': duracao,
+        'requisicoes': total,
+        'req_por_s': round(total / duracao, 2),
+        'taxa_erro': round(total_erros / total, 4) if total else 0.0,
+        'endpoints': endpoints,
+        'recursos': recursos,
+    }
+
+
+def imprimir_relatorio(relatorio, anterior=None):
+    print(f"\nConcorrência: {relatorio['concorrencia']}  Duração: {relatorio['duracao_s']}s  "
+          f"Total: {relatorio['requisicoes']} req ({relatorio['req_por_s']} req/s)  "
+          f"Erros: {relatorio['taxa_erro']:.2%}")
+    print(f"\n{'endpoint':15s} {'req':>6s} {'req/s':>8s} {'erro%':>7s} {'p50':>9s} {'p95':>9s} {'p99':>9s} {'max':>9s}")
+    for operacao, r in relatorio['endpoints'].items():
+        linha = (f"{operacao:15s} {r['requisicoes']:6d} {r['req_por_s']:8.2f} {r['taxa_erro']:7.2%} "
+                 f"{r['p50_ms']:9.1f} {r['p95_ms']:9.1f} {r['p99_ms']:9.1f} {r['max_ms']:9.1f}")
+        if anterior and operacao in anterior['endpoints']:
+            antes = anterior['endpoints'][operacao]
+            delta = lambda chave: (r[chave] - antes[chave]) / antes[chave] if antes[chave] else 0.0
+            linha += f"   Δp50 {delta('p50_ms'):+.1%}  Δp95 {delta('p95_ms'):+.1%}  Δp99 {delta('p99_ms'):+.1%}"
+        print(linha)
+    if relatorio['recursos']:
+        recursos = relatorio['recursos']
+        print(f"\nServidor: RSS pico {recursos['rss_mb_pico']} MB (médio {recursos['rss_mb_medio']} MB), "
+              f"CPU média {recursos['cpu_percent_medio']}% (pico {recursos['cpu_percent_pico']}%)")
+    elif psutil is None:
+        print("\n(instale psutil para medir RSS e CPU do servidor)")
+
+
+def porta_livre() -> int:
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def iniciar_servidor(producao: bool, workers: int):
+    porta = porta_livre()
+    if producao:
+        comando = [sys.executable, 'start_api.py', '--producao', '--workers', str(workers),
+                   '--host', '127.0.0.1', '--port', str(porta)]
+    else:
+        comando = [sys.executable, '-m', 'uvicorn', 'api:app', '--app-dir', 'src',
+                   '--host', '127.0.0.1', '--port', str(porta), '--log-level', 'warning']
+    servidor = subprocess.Popen(comando, cwd=BACKEND_DIR, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    url = f"http://127.0.0.1:{porta}"
+    cliente = Cliente(url)
+    limite = time.perf_counter() + 60
+    while time.perf_counter() < limite:
+        try:
+            if cliente.requisitar('GET', '/health')[0] == 200:
+                return servidor, url
+        except OSError:
+            time.sleep(0.1)
+    servidor.terminate()
+    raise TimeoutError("Servidor não iniciou em 60s")
+
+
+def parse_mix(texto: str) -> dict:
+    mix = {}
+    for item in texto.split(','):
+        nome, peso = item.split('=')
+        nome = nome.strip()
+        if nome not in MIX_PADRAO:
+            raise ValueError(f"Endpoint desconhecido no mix: {nome}")
+        mix[nome] = float(peso)
+    return mix
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Teste de carga local da API")
+    parser.add_argument('--url', help="Usa um servidor já em execução em vez de iniciar um")
+    parser.add_argument('--pid', type=int, help="PID do servidor em --url, para medir RSS/CPU")
+    parser.add_argument('--producao', action='store_true', help="Inicia o servidor em modo produção")
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--concorrencia', type=int, default=8)
+    parser.add_argument('--duracao', type=float, default=20.0, help="Duração em segundos")
+    parser.add_argument('--mix', type=parse_mix, default=MIX_PADRAO,
+                        help="Pesos por endpoint, ex.: 'upload=1,process=3,preview=3'")
+    parser.add_argument('--sinteticas', type=int, default=6, help="Quantidade de imagens sintéticas")
+    parser.add_argument('--semente', type=int, default=42)
+    parser.add_argument('--saida', help="Salva o relatório em JSON")
+    parser.add_argument('--comparar', help="Relatório JSON anterior para comparação")
+    args = parser.parse_args()
+
+    random.seed(args.semente)
+    imagens = imagens_amostra() + imagens_sinteticas(args.sinteticas, args.semente)
+
+    servidor = None
+    if args.url:
+        url, pid = args.url, args.pid
+    else:
+        servidor, url = iniciar_servidor(args.producao, args.workers)
+        pid = servidor.pid
+
+    try:
+        gerador = GeradorCarga(Cliente(url), imagens, args.mix)
+        for _ in range(max(4, args.concorrencia)):
+            gerador.upload()
+        gerador.latencias.clear()
+        gerador.erros.clear()
+
+        monitor = MonitorRecursos(pid) if pid and psutil is not None else None
+        if monitor:
+            monitor.iniciar()
+        print(f"🔥 {args.concorrencia} clientes por {args.duracao}s contra {url} ...")
+        inicio = time.perf_counter()
+        gerador.rodar(args.concorrencia, args.duracao)
+        duracao = time.perf_counter() - inicio
+        if monitor:
+            monitor.parar()
+
+        relatorio = montar_relatorio(gerador, round(duracao, 2), args.concorrencia,
+                                     monitor.resumo() if monitor else None)
+        relatorio['mix'] = args.mix
+
+        with gerador.ids_lock:
+            ids = list(gerador.ids)
+        cliente = Cliente(url)
+        for image_id in ids:
+            try:
+                cliente.requisitar('DELETE', f'/delete/{image_id}')
+            except OSError:
+                pass
+    finally:
+        if servidor is not None:
+            servidor.terminate()
+            servidor.wait()
+
+    anterior = None
+    if args.comparar:
+        with open(args.comparar) as f:
+            anterior = json.load(f)
+    imprimir_relatorio(relatorio, anterior)
+
+    if args.saida:
+        with open(args.saida, 'w') as f:
+            json.dump(relatorio, f, indent=2)
+        print(f"\n💾 Relatório salvo em: {args.saida}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+"""
+Benchmark de inicialização da API
+
+Mede o tempo de import dos módulos do backend em um interpretador limpo e o
+tempo até a primeira requisição respondida por um servidor uvicorn recém
+iniciado. Com --orcamento-* o script falha (código 1) se o orçamento for
+excedido, permitindo usá-lo em CI.
+
+Uso:
+    python benchmarks/inicializacao.py --repeticoes 5
+    python benchmarks/inicializacao.py --orcamento-import-ms 800 --orcamento-primeira-req-ms 2500
+"""
+
+import argparse
+import json
+import socket
+import statistics
+import subprocess
+import sys
+import time
+import urllib.request
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+SRC_DIR = BACKEND_DIR / 'src'
+
+
+def medir_import(modulo: str) -> float:
+    codigo = (
+        "import time, sys; t = time.perf_counter(); "
+        f"import {modulo}; "
+        "sys.stdout.write(str(time.perf_counter() - t))"
+    )
+    saida = subprocess.run(
+        [sys.executable, '-c', codigo],
+        cwd=SRC_DIR, capture_output=True, text=True, check=True
+    )
+    return float(saida.stdout) * 1000
+
+
+def porta_livre() -> int:
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def medir_primeira_requisicao(timeout: float = 30.0) -> float:
+    porta = porta_livre()
+    inicio = time.perf_counter()
+    servidor = subprocess.Popen(
+        [sys.executable, '-m', 'uvicorn', 'api:app', '--app-dir', str(SRC_DIR),
+         '--host', '127.0.0.1', '--port', str(porta), '--log-level', 'warning'],
+        cwd=BACKEND_DIR
+    )
+    try:
+        url = f"http://127.0.0.1:{porta}/health"
+        while time.perf_counter() - inicio < timeout:
+            try:
+                with urllib.request.urlopen(url, timeout=1) as resposta:
+                    if resposta.status == 200:
+                        return (time.perf_counter() - inicio) * 1000
+            except OSError:
+                time.sleep(0.02)
+        raise TimeoutError(f"Servidor não respondeu em {timeout}s")
+    finally:
+        servidor.terminate()
+        servidor.wait()
+
+
+def resumir(amostras):
+    return {
+        'mediana_ms': round(statistics.median(amostras), 1),
+        'min_ms': round(min(amostras), 1),
+        'max_ms': round(max(amostras), 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de inicialização da API")
+    parser.add_argument('--repeticoes', type=int, default=3)
+    parser.add_argument('--orcamento-import-ms', type=float, default=None)
+    parser.add_argument('--orcamento-primeira-req-ms', type=float, default=None)
+    parser.add_argument('--json', action='store_true', help="Imprime o relatório em JSON")
+    args = parser.parse_args()
+
+    relatorio = {
+        'import_processamento_imagem': resumir(
+            [medir_import('processamento_imagem') for _ in range(args.repeticoes)]
+        ),
+        'import_api': resumir([medir_import('api') for _ in range(args.repeticoes)]),
+        'primeira_requisicao': resumir(
+            [medir_primeira_requisicao() for _ in range(args.repeticoes)]
+        ),
+    }
+
+    if args.json:
+        print(json.dumps(relatorio, indent=2))
+    else:
+        for nome, valores in relatorio.items():
+            print(f"{nome:30s} mediana={valores['mediana_ms']:8.1f} ms  "
+                  f"min={valores['min_ms']:8.1f} ms  max={valores['max_ms']:8.1f} ms")
+
+    falhou = False
+    if args.orcamento_import_ms is not None:
+        if relatorio['import_api']['mediana_ms'] > args.orcamento_import_ms:
+            print(f"❌ Import da API acima do orçamento ({args.orcamento_import_ms} ms)")
+            falhou = True
+    if args.orcamento_primeira_req_ms is not None:
+        if relatorio['primeira_requisicao']['mediana_ms'] > args.orcamento_primeira_req_ms:
+            print(f"❌ Primeira requisição acima do orçamento ({args.orcamento_primeira_req_ms} ms)")
+            falhou = True
+    sys.exit(1 if falhou else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -43,19 +43,22 @@ def exemplo_basico():
     # Ajusta o brilho
     print(f"\n📝 Aumentando brilho (fator 1.5)...")
     processador.ajustar_brilho(1.5)
-    processador.salvar("output/imagem_brilhante.jpg")
+    relatorio = processador.salvar("output/imagem_brilhante.jpg")
+    print(f"Imagem salva em: {relatorio['caminho']}")
     
     # Reseta e ajusta o contraste
     print(f"📝 Resetando e aumentando contraste (fator 2.0)...")
     processador.resetar()
     processador.ajustar_contraste(2.0)
-    processador.salvar("output/imagem_contraste.jpg")
+    relatorio = processador.salvar("output/imagem_contraste.jpg")
+    print(f"Imagem salva em: {relatorio['caminho']}")
     
     # Reseta e ajusta ambos
     print(f"📝 Ajustando brilho e contraste simultaneamente...")
     processador.resetar()
     processador.ajustar_brilho_contraste(1.2, 1.5)
-    processador.salvar("output/imagem_brilho_contraste.jpg")
+    relatorio = processador.salvar("output/imagem_brilho_contraste.jpg")
+    print(f"Imagem salva em: {relatorio['caminho']}")
     
     print("\n✅ Processamento concluído!")
 
@@ -166,7 +169,8 @@ def exemplo_interativo():
         if not caminho_saida:
             caminho_saida = "output/processada.jpg"
         
-        processador.salvar(caminho_saida)
+        relatorio = processador.salvar(caminho_saida)
+        print(f"Imagem salva em: {relatorio['caminho']}")
         
         # Pergunta se deseja visualizar
         visualizar = input("\nDeseja visualizar a imagem? (s/n): ").strip().lower()
@@ -1,22 +1,50 @@
-from fastapi import FastAPI, File, UploadFile, HTTPException, Form
+from fastapi import FastAPI, File, UploadFile, HTTPException, Form, Request, BackgroundTasks
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import FileResponse, JSONResponse
+from fastapi.responses import FileResponse, JSONResponse, Response, StreamingResponse
 from pydantic import BaseModel, Field
-from typing import Optional
+from typing import Optional, List, Tuple, Dict, Any
 import os
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from contextlib import asynccontextmanager
 import uuid
 from pathlib import Path
 import shutil
 from PIL import Image
 import io
 import base64
+import hashlib
+import json
+import zipfile
+import fnmatch
+from pathlib import PurePosixPath
+from email.utils import formatdate, parsedate_to_datetime
+
+from processamento_imagem import (
+    ProcessadorImagem, PERFIS_CODIFICACAO, EXTENSOES_FORMATO, FORMATOS_MULTIQUADRO, niveis_piramide
+)
+from bloqueio import bloqueio_arquivo, escrita_atomica
+from estatisticas import ler_estatisticas, obter_estatisticas, remover_estatisticas
+from cache_tiles import CacheTiles, ImagensDecodificadas
+from coalescencia import Coalescedor
+from presets import RepositorioPresets, validar_operacoes
+from lote_arquivo import iterar_membros, nome_seguro, MembroInvalido, ZipStreaming
+from pool_processos import PoolProcessos
+
+
+@asynccontextmanager
+async def ciclo_de_vida(app: FastAPI):
+    yield
+    if pool_processos is not None:
+        pool_processos.fechar()
 
-from processamento_imagem import ProcessadorImagem
 
 app = FastAPI(
     title="API de Processamento de Imagens",
     description="API REST para ajuste de brilho e contraste em imagens",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=ciclo_de_vida
 )
 
 app.add_middleware(
@@ -25,6 +53,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["ETag", "X-Encode-Format", "X-Encode-Profile", "X-Encode-Bytes", "X-Encode-Time-Ms"],
 )
 
 UPLOAD_DIR = Path("temp/uploads")
@@ -32,6 +61,155 @@ OUTPUT_DIR = Path("temp/outputs")
 UPLOAD_DIR.mkdir(parents=True, exist_ok=True)
 OUTPUT_DIR.mkdir(parents=True, exist_ok=True)
 
+# Cada worker do uvicorn tem seu próprio executor local; o estado
+# compartilhado entre workers fica em disco (UPLOAD_DIR/OUTPUT_DIR).
+EXECUTOR_WORKERS = int(os.environ.get("API_EXECUTOR_WORKERS", min(4, os.cpu_count() or 1)))
+executor = ThreadPoolExecutor(max_workers=EXECUTOR_WORKERS, thread_name_prefix="processamento")
+
+
+# Processos para as operações pesadas em CPU (pixels via memória compartilhada);
+# criados no primeiro uso. Os núcleos são divididos entre os workers do uvicorn;
+# API_PROCESSOS_WORKERS=0 desliga o pool e processa tudo nas threads.
+PROCESSOS_WORKERS = int(os.environ.get(
+    "API_PROCESSOS_WORKERS", max(1, (os.cpu_count() or 1) // int(os.environ.get("API_WORKERS", 1)))
+))
+pool_processos = PoolProcessos(PROCESSOS_WORKERS) if PROCESSOS_WORKERS > 0 else None
+
+
+async def executar(func, *args, **kwargs):
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(executor, partial(func, *args, **kwargs))
+
+
+# Com API_PERFILAR_MEMORIA=1 as respostas de processamento incluem o pico de
+# alocação por operação (tracemalloc); desligado por padrão pelo custo extra.
+PERFILAR_MEMORIA = os.environ.get("API_PERFILAR_MEMORIA", "0") == "1"
+
+
+def salvar_upload(file: UploadFile, file_path: Path):
+    with escrita_atomica(file_path) as temporario:
+        with open(temporario, "wb") as buffer:
+            shutil.copyfileobj(file.file, buffer)
+
+
+def id_valido(image_id: str) -> bool:
+    """Os ids são UUIDs gerados no upload; qualquer outra coisa pode escapar dos diretórios em globs e caminhos."""
+    try:
+        return str(uuid.UUID(image_id)) == image_id
+    except ValueError:
+        return False
+
+
+def operacoes_ajuste(brightness: float, contrast: float, saturation: float) -> List[Tuple[str, Dict[str, Any]]]:
+    return [
+        ("ajustar_brilho_contraste", {"fator_brilho": brightness, "fator_contraste": contrast}),
+        ("ajustar_saturacao", {"fator": saturation}),
+    ]
+
+
+def processar_e_salvar(image_id: str, input_path: Path, operacoes: List[Tuple[str, Dict[str, Any]]]) -> dict:
+    """
+    Aplica `operacoes` (nome do método, parâmetros) e grava a saída sob lock do
+    image_id. Retorna o relatório de codificação de `ProcessadorImagem.salvar`.
+    """
+    processador = ProcessadorImagem(str(input_path), manter_original=False,
+                                    perfilar_memoria=PERFILAR_MEMORIA, pool=pool_processos)
+    processador.aplicar_operacoes(operacoes)
+    
+    output_path = OUTPUT_DIR / f"{image_id}_processed{input_path.suffix}"
+    with bloqueio_arquivo(image_id):
+        # Um /delete pode ter rodado enquanto a imagem era processada.
+        if not input_path.exists():
+            raise FileNotFoundError(f"Imagem {image_id} foi deletada")
+        with escrita_atomica(output_path) as temporario:
+            relatorio = processador.salvar(str(temporario), perfil=PERFIL_POR_ENDPOINT["processamento"])
+    relatorio["caminho"] = str(output_path)
+    if PERFILAR_MEMORIA:
+        relatorio["memoria"] = processador.perfil_memoria
+    return relatorio
+
+
+coalescedor = Coalescedor()
+
+
+async def processar_coalescido(image_id: str, input_path: Path, operacoes: List[Tuple[str, Dict[str, Any]]]) -> dict:
+    """`processar_e_salvar` com coalescência de requisições idênticas em andamento."""
+    chave = ("processar", image_id, str(input_path), repr(operacoes))
+    return await coalescedor.executar(chave, executar, processar_e_salvar, image_id, input_path, operacoes)
+
+
+def calcular_histograma(file_path: Path) -> dict:
+    return ProcessadorImagem(str(file_path), manter_original=False).gerar_histograma()
+
+
+def ler_info(file_path: Path) -> dict:
+    return ProcessadorImagem(str(file_path), manter_original=False).obter_info()
+
+
+async def estatisticas_coalescidas(file_path: Path) -> dict:
+    """Estatísticas do sidecar da original, calculando-as (uma vez) se ainda não existem."""
+    chave = ("estatisticas", str(file_path))
+    return await coalescedor.executar(chave, executar, obter_estatisticas, file_path)
+
+
+async def precalcular_estatisticas(file_path: Path):
+    try:
+        await estatisticas_coalescidas(file_path)
+    except Exception as e:
+        # Sem o sidecar os endpoints de análise calculam sob demanda.
+        print(f"Falha ao pré-calcular estatísticas de {file_path.name}: {e}")
+
+# Perfil de codificação usado por cada endpoint que grava imagens; as saídas
+# de processamento são intermediárias e priorizam tempo, o download
+# priorizando tamanho pode ser pedido via ?profile=menor.
+PERFIL_POR_ENDPOINT = {
+    "processamento": os.environ.get("API_PERFIL_PROCESSAMENTO", "rapido"),
+    "download": os.environ.get("API_PERFIL_DOWNLOAD", "balanceado"),
+}
+
+# Originais nunca mudam para um mesmo id; processadas são sobrescritas a cada
+# processamento e precisam ser revalidadas (ETag) antes de reutilizar o cache.
+CACHE_CONTROL = {
+    ("download", False): "public, max-age=86400",
+    ("download", True): "public, no-cache",
+    ("preview", False): "public, max-age=86400",
+    ("preview", True): "public, no-cache",
+    ("tiles", False): "public, max-age=86400",
+    ("tiles", True): "public, no-cache",
+}
+
+
+def gerar_etag(file_path: Path, *variante) -> str:
+    stat = file_path.stat()
+    base = f"{file_path.name}:{stat.st_size}:{stat.st_mtime_ns}:{variante}"
+    return f'"{hashlib.sha1(base.encode()).hexdigest()}"'
+
+
+def cabecalhos_cache(file_path: Path, etag: str, endpoint: str, processed: bool) -> dict:
+    return {
+        "ETag": etag,
+        "Last-Modified": formatdate(file_path.stat().st_mtime, usegmt=True),
+        "Cache-Control": CACHE_CONTROL[(endpoint, processed)],
+    }
+
+
+def nao_modificado(request: Request, file_path: Path, etag: str) -> bool:
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        tags = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+        return "*" in tags or etag in tags
+    
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since is not None:
+        try:
+            data = parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+        return int(file_path.stat().st_mtime) <= data.timestamp()
+    
+    return False
+
+
 class ImageAdjustments(BaseModel):
     brightness: float = Field(1.0, ge=0.0, le=3.0, description="Fator de brilho (0.0-3.0)")
     contrast: float = Field(1.0, ge=0.0, le=3.0, description="Fator de contraste (0.0-3.0)")
@@ -45,6 +223,20 @@ class ImageResponse(BaseModel):
     width: int
     height: int
     size_bytes: int
+    frames: int = 1
+    mean_luminance: Optional[float] = None
+
+class PresetOperation(BaseModel):
+    operation: str = Field(..., description="Método do ProcessadorImagem, ex.: aplicar_clahe")
+    params: Dict[str, Any] = Field(default_factory=dict)
+
+class Preset(BaseModel):
+    description: Optional[str] = None
+    operations: List[PresetOperation]
+
+class ApplyPresetRequest(BaseModel):
+    image_ids: Optional[List[str]] = Field(None, description="Ids das imagens")
+    filter: Optional[str] = Field(None, description="Padrão glob sobre os ids, ex.: '*' para todas")
 
 class ProcessResponse(BaseModel):
     success: bool
@@ -52,6 +244,7 @@ class ProcessResponse(BaseModel):
     output_id: str
     brightness: float
     contrast: float
+    encoding: Optional[dict] = None
 
 
 @app.get("/")
@@ -70,9 +263,15 @@ async def root():
             "POST /apply-s-curve/{image_id}": "Aplicar curva S para contraste",
             "GET /histogram/{image_id}": "Obter histograma da imagem",
             "POST /batch-process": "Processamento em lote de múltiplas imagens",
+            "POST /batch-archive": "Processamento em lote de um arquivo ZIP/TAR, resposta ZIP em streaming",
             "GET /download/{image_id}": "Download da imagem processada",
             "GET /preview/{image_id}": "Preview base64 da imagem",
             "GET /info/{image_id}": "Informações da imagem",
+            "GET /tiles/{image_id}/info": "Metadados da pirâmide de tiles (Deep Zoom)",
+            "GET /tiles/{image_id}/{level}/{x}/{y}": "Tile da pirâmide, gerado sob demanda e cacheado",
+            "GET /presets": "Listar presets salvos no servidor",
+            "PUT /presets/{name}": "Criar ou atualizar preset",
+            "POST /presets/{name}/apply": "Aplicar preset a imagens já enviadas (por id ou filtro)",
             "DELETE /delete/{image_id}": "Deletar imagem",
             "POST /process-base64": "Processar imagem via base64"
         }
@@ -86,7 +285,7 @@ async def health_check():
     }
 
 @app.post("/upload", response_model=ImageResponse)
-async def upload_image(file: UploadFile = File(...)):
+async def upload_image(background_tasks: BackgroundTasks, file: UploadFile = File(...)):
     try:
         if not file.content_type.startswith("image/"):
             raise HTTPException(status_code=400, detail="Arquivo deve ser uma imagem")
@@ -96,11 +295,9 @@ async def upload_image(file: UploadFile = File(...)):
         filename = f"{image_id}{file_extension}"
         file_path = UPLOAD_DIR / filename
         
-        with open(file_path, "wb") as buffer:
-            shutil.copyfileobj(file.file, buffer)
-        
-        processador = ProcessadorImagem(str(file_path))
-        info = processador.obter_info()
+        await executar(salvar_upload, file, file_path)
+        info = await executar(ler_info, file_path)
+        background_tasks.add_task(precalcular_estatisticas, file_path)
         
         file_size = os.path.getsize(file_path)
         
@@ -111,7 +308,8 @@ async def upload_image(file: UploadFile = File(...)):
             mode=info['modo'],
             width=info['largura'],
             height=info['altura'],
-            size_bytes=file_size
+            size_bytes=file_size,
+            frames=info['quadros']
         )
         
     except Exception as e:
@@ -129,23 +327,17 @@ async def process_image(
         if not input_files:
             raise HTTPException(status_code=404, detail="Imagem não encontrada")
         
-        input_path = input_files[0]
-        file_extension = input_path.suffix
-        
-        processador = ProcessadorImagem(str(input_path))
-        processador.ajustar_brilho_contraste(brightness, contrast)
-        processador.ajustar_saturacao(saturation)
-        
-        output_filename = f"{image_id}_processed{file_extension}"
-        output_path = OUTPUT_DIR / output_filename
-        processador.salvar(str(output_path))
+        relatorio = await processar_coalescido(image_id, input_files[0], [
+            *operacoes_ajuste(brightness, contrast, saturation),
+        ])
         
         return ProcessResponse(
             success=True,
             message="Imagem processada com sucesso",
             output_id=image_id,
             brightness=brightness,
-            contrast=contrast
+            contrast=contrast,
+            encoding=relatorio
         )
         
     except FileNotFoundError:
@@ -155,12 +347,48 @@ async def process_image(
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Erro ao processar: {str(e)}")
 
+def exportar_imagem(image_id: str, variante: str, file_path: Path, etag: str,
+                    formato: str, perfil: str, opcoes: dict) -> Tuple[Path, dict]:
+    """
+    Recodifica `file_path` para o /download. O arquivo leva o ETag no nome, então
+    cada variante (formato, perfil, qualidade) tem o seu e é reaproveitada até a
+    origem mudar; exportações de versões anteriores da origem são apagadas.
+    `tempo_ms` é 0 quando o arquivo já existia.
+    """
+    prefixo = f"{image_id}_export-{variante}-"
+    nome = f"{prefixo}{etag.strip(chr(34))[:16]}"
+    existentes = list(OUTPUT_DIR.glob(f"{nome}.*"))
+    if existentes:
+        caminho = existentes[0]
+        formato_existente = {extensao: fmt for fmt, extensao in EXTENSOES_FORMATO.items()}[caminho.suffix]
+        return caminho, {"formato": formato_existente, "perfil": perfil, "tempo_ms": 0,
+                         "bytes": caminho.stat().st_size}
+    
+    processador = ProcessadorImagem(str(file_path), manter_original=False)
+    formato = processador.escolher_formato() if formato == 'auto' else formato
+    formato = formato.upper().replace('JPG', 'JPEG')
+    caminho = OUTPUT_DIR / f"{nome}{EXTENSOES_FORMATO[formato]}"
+    with escrita_atomica(caminho) as temporario:
+        relatorio = processador.salvar(str(temporario), perfil=perfil, formato=formato, **opcoes)
+    
+    versao_origem = file_path.stat().st_mtime
+    for antigo in OUTPUT_DIR.glob(f"{prefixo}*"):
+        try:
+            if antigo.stat().st_mtime < versao_origem:
+                antigo.unlink()
+        except FileNotFoundError:
+            pass
+    return caminho, relatorio
+
+
 @app.get("/download/{image_id}")
 async def download_image(
+    request: Request,
     image_id: str, 
     processed: bool = True,
     format: str = None,
-    quality: int = 95
+    quality: Optional[int] = None,
+    profile: str = None
 ):
     try:
         if processed:
@@ -174,36 +402,53 @@ async def download_image(
                 raise HTTPException(status_code=404, detail="Imagem original não encontrada")
             file_path = input_files[0]
         
-        if format and format.lower() in ['jpeg', 'jpg', 'png', 'webp']:
-            img = Image.open(file_path)
-            
-            temp_path = OUTPUT_DIR / f"{image_id}_export.{format.lower()}"
-            
-            if format.lower() in ['jpeg', 'jpg'] and img.mode in ('RGBA', 'LA', 'P'):
-                img = img.convert('RGB')
-            
-            quality = max(1, min(100, quality))
-            
-            if format.lower() in ['jpeg', 'jpg']:
-                img.save(temp_path, 'JPEG', quality=quality, optimize=True)
-            elif format.lower() == 'webp':
-                img.save(temp_path, 'WEBP', quality=quality)
-            else:
-                img.save(temp_path, 'PNG', optimize=True)
-            
-            file_path = temp_path
+        profile = profile or PERFIL_POR_ENDPOINT["download"]
+        if profile not in PERFIS_CODIFICACAO:
+            raise HTTPException(status_code=400, detail=f"Perfil inválido. Use: {', '.join(PERFIS_CODIFICACAO)}")
+        
+        opcoes = {} if quality is None else {"quality": max(1, min(100, quality))}
+        exportar = bool(format and format.lower() in ['jpeg', 'jpg', 'png', 'webp', 'auto'])
+        nome_download = file_path.name
+        formato_pedido = exportar
+        if not exportar and processed and file_path.suffix.lower() == '.png':
+            # Saídas de processamento usam o perfil rápido; sem `format`, PNGs
+            # são recodificados (sem perda) com o perfil de download. JPEG/WEBP
+            # vão como estão para não perder qualidade numa segunda codificação.
+            format, exportar = 'png', True
+        etag = gerar_etag(file_path, *((format.lower(), profile, quality) if exportar else ()))
+        headers = cabecalhos_cache(file_path, etag, "download", processed)
+        if nao_modificado(request, file_path, etag):
+            return Response(status_code=304, headers=headers)
+        
+        if exportar:
+            variante = "processed" if processed else "original"
+            chave = ("exportar", image_id, variante, etag)
+            file_path, relatorio = await coalescedor.executar(
+                chave, executar, exportar_imagem, image_id, variante, file_path, etag,
+                format.lower(), profile, opcoes
+            )
+            format = relatorio["formato"].lower()
+            if formato_pedido:
+                nome_download = f"{image_id}_export{file_path.suffix}"
+            headers["X-Encode-Format"] = relatorio["formato"]
+            headers["X-Encode-Profile"] = profile
+            headers["X-Encode-Bytes"] = str(relatorio["bytes"])
+            headers["X-Encode-Time-Ms"] = str(relatorio["tempo_ms"])
         
         return FileResponse(
             path=str(file_path),
             media_type=f"image/{format if format else 'jpeg'}",
-            filename=file_path.name
+            filename=nome_download,
+            headers=headers
         )
         
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Erro ao baixar: {str(e)}")
 
 @app.get("/preview/{image_id}")
-async def preview_image(image_id: str, processed: bool = True):
+async def preview_image(request: Request, image_id: str, processed: bool = True):
     try:
         if processed:
             output_files = list(OUTPUT_DIR.glob(f"{image_id}_processed.*"))
@@ -216,18 +461,26 @@ async def preview_image(image_id: str, processed: bool = True):
                 raise HTTPException(status_code=404, detail="Imagem original não encontrada")
             file_path = input_files[0]
         
+        etag = gerar_etag(file_path, "preview")
+        headers = cabecalhos_cache(file_path, etag, "preview", processed)
+        if nao_modificado(request, file_path, etag):
+            return Response(status_code=304, headers=headers)
+        
         with open(file_path, "rb") as image_file:
             image_data = base64.b64encode(image_file.read()).decode()
         
         image = Image.open(file_path)
         mime_type = f"image/{image.format.lower()}"
         
-        return {
-            "id": image_id,
-            "processed": processed,
-            "mime_type": mime_type,
-            "data": f"data:{mime_type};base64,{image_data}"
-        }
+        return JSONResponse(
+            content={
+                "id": image_id,
+                "processed": processed,
+                "mime_type": mime_type,
+                "data": f"data:{mime_type};base64,{image_data}"
+            },
+            headers=headers
+        )
         
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Erro ao gerar preview: {str(e)}")
@@ -241,8 +494,7 @@ async def get_image_info(image_id: str):
         
         file_path = input_files[0]
         
-        processador = ProcessadorImagem(str(file_path))
-        info = processador.obter_info()
+        info = await executar(ler_estatisticas, file_path) or await executar(ler_info, file_path)
         file_size = os.path.getsize(file_path)
         
         return ImageResponse(
@@ -252,20 +504,26 @@ async def get_image_info(image_id: str):
             mode=info['modo'],
             width=info['largura'],
             height=info['altura'],
-            size_bytes=file_size
+            size_bytes=file_size,
+            frames=info['quadros'],
+            mean_luminance=info.get('luminancia_media')
         )
         
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Erro ao obter informações: {str(e)}")
 
-@app.delete("/delete/{image_id}")
-async def delete_image(image_id: str):
-    try:
-        deleted_files = []
-        
+def remover_arquivos_imagem(image_id: str) -> List[str]:
+    """
+    Apaga original, saídas, exportações, tiles e o arquivo de lock do image_id.
+    Roda sob o lock, então uma gravação em andamento termina antes e as
+    seguintes veem que a original não existe mais.
+    """
+    deleted_files = []
+    with bloqueio_arquivo(image_id, remover=True):
         input_files = list(UPLOAD_DIR.glob(f"{image_id}.*"))
         for file in input_files:
             file.unlink()
+            remover_estatisticas(file)
             deleted_files.append(str(file))
         
         output_files = list(OUTPUT_DIR.glob(f"{image_id}_processed.*"))
@@ -273,6 +531,21 @@ async def delete_image(image_id: str):
             file.unlink()
             deleted_files.append(str(file))
         
+        for file in OUTPUT_DIR.glob(f"{image_id}_export*"):
+            file.unlink(missing_ok=True)
+        
+        cache_tiles.remover_imagem(image_id)
+    return deleted_files
+
+
+@app.delete("/delete/{image_id}")
+async def delete_image(image_id: str):
+    if not id_valido(image_id):
+        raise HTTPException(status_code=400, detail="Id inválido")
+    
+    try:
+        deleted_files = await executar(remover_arquivos_imagem, image_id)
+        
         if not deleted_files:
             raise HTTPException(status_code=404, detail="Imagem não encontrada")
         
@@ -296,23 +569,30 @@ async def process_image_base64(
             image_data = image_data.split("base64,")[1]
         
         image_bytes = base64.b64decode(image_data)
-        image = Image.open(io.BytesIO(image_bytes))
-        
-        image_id = str(uuid.uuid4())
-        temp_input = UPLOAD_DIR / f"{image_id}.png"
-        temp_output = OUTPUT_DIR / f"{image_id}_processed.png"
-        
-        image.save(temp_input)
-        
-        processador = ProcessadorImagem(str(temp_input))
-        processador.ajustar_brilho_contraste(brightness, contrast)
-        processador.salvar(str(temp_output))
         
-        with open(temp_output, "rb") as f:
-            processed_data = base64.b64encode(f.read()).decode()
+        def processar():
+            image = Image.open(io.BytesIO(image_bytes))
+            
+            image_id = str(uuid.uuid4())
+            temp_input = UPLOAD_DIR / f"{image_id}.png"
+            temp_output = OUTPUT_DIR / f"{image_id}_processed.png"
+            
+            image.save(temp_input)
+            
+            processador = ProcessadorImagem(str(temp_input), manter_original=False, pool=pool_processos)
+            processador.aplicar_operacoes([
+                ("ajustar_brilho_contraste", {"fator_brilho": brightness, "fator_contraste": contrast})
+            ])
+            processador.salvar(str(temp_output))
+            
+            with open(temp_output, "rb") as f:
+                processed_data = base64.b64encode(f.read()).decode()
+            
+            temp_input.unlink()
+            temp_output.unlink()
+            return processed_data
         
-        temp_input.unlink()
-        temp_output.unlink()
+        processed_data = await executar(processar)
         
         return {
             "success": True,
@@ -332,20 +612,20 @@ async def auto_adjust_image(image_id: str):
         if not input_files:
             raise HTTPException(status_code=404, detail="Imagem não encontrada")
         
-        input_path = input_files[0]
-        file_extension = input_path.suffix
+        # Percentis do sidecar poupam a varredura dos pixels; em animações
+        # cada quadro continua usando os próprios.
+        parametros = {}
+        estatisticas = await executar(ler_estatisticas, input_files[0])
+        if estatisticas and estatisticas['percentis'] and estatisticas['quadros'] == 1:
+            parametros["percentis"] = list(estatisticas['percentis'].values())
         
-        processador = ProcessadorImagem(str(input_path))
-        processador.ajuste_automatico()
-        
-        output_filename = f"{image_id}_processed{file_extension}"
-        output_path = OUTPUT_DIR / output_filename
-        processador.salvar(str(output_path))
+        relatorio = await processar_coalescido(image_id, input_files[0], [("ajuste_automatico", parametros)])
         
         return {
             "success": True,
             "message": "Ajuste automático aplicado com sucesso",
-            "output_id": image_id
+            "output_id": image_id,
+            "encoding": relatorio
         }
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Erro ao processar: {str(e)}")
@@ -362,22 +642,17 @@ async def apply_clahe(
         if not input_files:
             raise HTTPException(status_code=404, detail="Imagem não encontrada")
         
-        input_path = input_files[0]
-        file_extension = input_path.suffix
-        
-        processador = ProcessadorImagem(str(input_path))
-        processador.aplicar_clahe(clip_limit, (tile_grid_size, tile_grid_size))
-        
-        output_filename = f"{image_id}_processed{file_extension}"
-        output_path = OUTPUT_DIR / output_filename
-        processador.salvar(str(output_path))
+        relatorio = await processar_coalescido(image_id, input_files[0], [
+            ("aplicar_clahe", {"clip_limit": clip_limit, "tile_grid_size": (tile_grid_size, tile_grid_size)}),
+        ])
         
         return {
             "success": True,
             "message": "CLAHE aplicado com sucesso",
             "output_id": image_id,
             "clip_limit": clip_limit,
-            "tile_grid_size": tile_grid_size
+            "tile_grid_size": tile_grid_size,
+            "encoding": relatorio
         }
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Erro ao processar: {str(e)}")
@@ -394,8 +669,11 @@ async def get_histogram(image_id: str, processed: bool = False):
         if not files:
             raise HTTPException(status_code=404, detail="Imagem não encontrada")
         
-        processador = ProcessadorImagem(str(files[0]))
-        histograma = processador.gerar_histograma()
+        if processed:
+            chave = ("histograma", str(files[0]), files[0].stat().st_mtime_ns)
+            histograma = await coalescedor.executar(chave, executar, calcular_histograma, files[0])
+        else:
+            histograma = (await estatisticas_coalescidas(files[0]))['histograma']
         
         return {
             "image_id": image_id,
@@ -416,21 +694,16 @@ async def apply_s_curve(
         if not input_files:
             raise HTTPException(status_code=404, detail="Imagem não encontrada")
         
-        input_path = input_files[0]
-        file_extension = input_path.suffix
-        
-        processador = ProcessadorImagem(str(input_path))
-        processador.aplicar_curva_s(intensity)
-        
-        output_filename = f"{image_id}_processed{file_extension}"
-        output_path = OUTPUT_DIR / output_filename
-        processador.salvar(str(output_path))
+        relatorio = await processar_coalescido(image_id, input_files[0], [
+            ("aplicar_curva_s", {"intensidade": intensity}),
+        ])
         
         return {
             "success": True,
             "message": "Curva S aplicada com sucesso",
             "output_id": image_id,
-            "intensity": intensity
+            "intensity": intensity,
+            "encoding": relatorio
         }
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Erro ao processar: {str(e)}")
@@ -461,21 +734,16 @@ async def batch_process(
             filename = f"{image_id}{file_extension}"
             file_path = UPLOAD_DIR / filename
             
-            with open(file_path, "wb") as buffer:
-                shutil.copyfileobj(file.file, buffer)
-            
-            processador = ProcessadorImagem(str(file_path))
-            processador.ajustar_brilho_contraste(brightness, contrast)
-            processador.ajustar_saturacao(saturation)
-            
-            output_filename = f"{image_id}_processed{file_extension}"
-            output_path = OUTPUT_DIR / output_filename
-            processador.salvar(str(output_path))
+            await executar(salvar_upload, file, file_path)
+            relatorio = await executar(processar_e_salvar, image_id, file_path, [
+                *operacoes_ajuste(brightness, contrast, saturation),
+            ])
             
             results.append({
                 "id": image_id,
                 "filename": file.filename,
-                "success": True
+                "success": True,
+                "encoding": relatorio
             })
         
         return {
@@ -492,6 +760,319 @@ async def batch_process(
         raise HTTPException(status_code=500, detail=f"Erro no processamento em lote: {str(e)}")
 
 
+# Quantos membros de um arquivo ficam decodificados/processando ao mesmo
+# tempo; limita a memória do /batch-archive independentemente do tamanho do lote.
+MAX_MEMBROS_EM_VOO = int(os.environ.get("API_MAX_MEMBROS_EM_VOO", EXECUTOR_WORKERS * 2))
+
+
+def processar_membro(nome: str, dados: bytes, operacoes: List[Tuple[str, Dict[str, Any]]],
+                     formato: Optional[str], perfil: str) -> Tuple[str, bytes, dict]:
+    processador = ProcessadorImagem(io.BytesIO(dados), manter_original=False, pool=pool_processos)
+    processador.aplicar_operacoes(operacoes)
+    
+    if formato is None:
+        # Animações mantêm o formato de origem para não perder os quadros.
+        suportados = FORMATOS_MULTIQUADRO if processador.num_quadros > 1 else EXTENSOES_FORMATO
+        formato = processador.imagem.format if processador.imagem.format in suportados else 'PNG'
+    dados_saida, relatorio = processador.codificar(formato, perfil)
+    
+    extensao = EXTENSOES_FORMATO.get(relatorio['formato']) or FORMATOS_MULTIQUADRO[relatorio['formato']]
+    caminho = PurePosixPath(nome_seguro(nome))
+    nome_saida = str(caminho.with_name(f"{caminho.stem}_processed{extensao}"))
+    return nome_saida, dados_saida, {
+        "source": nome,
+        "output": nome_saida,
+        "success": True,
+        "width": processador.imagem.width,
+        "height": processador.imagem.height,
+        "frames": processador.num_quadros,
+        "encoding": relatorio
+    }
+
+
+@app.post("/batch-archive")
+async def batch_archive(
+    file: UploadFile = File(...),
+    brightness: float = Form(1.0, ge=0.0, le=3.0),
+    contrast: float = Form(1.0, ge=0.0, le=3.0),
+    saturation: float = Form(1.0, ge=0.0, le=3.0),
+    output_format: Optional[str] = Form(None),
+    profile: Optional[str] = Form(None)
+):
+    profile = profile or PERFIL_POR_ENDPOINT["processamento"]
+    if profile not in PERFIS_CODIFICACAO:
+        raise HTTPException(status_code=400, detail=f"Perfil inválido. Use: {', '.join(PERFIS_CODIFICACAO)}")
+    if output_format is not None:
+        output_format = output_format.lower()
+        if output_format not in ['jpeg', 'jpg', 'png', 'webp', 'auto']:
+            raise HTTPException(status_code=400, detail="Formato de saída inválido")
+    
+    operacoes = operacoes_ajuste(brightness, contrast, saturation)
+    membros = iterar_membros(file.file)
+    fim = object()
+    try:
+        primeiro = await executar(next, membros, fim)
+    except (ValueError, zipfile.BadZipFile) as e:
+        raise HTTPException(status_code=400, detail=f"Arquivo inválido: {str(e)}")
+    
+    async def gerar_zip():
+        zip_saida = ZipStreaming()
+        manifesto = []
+        pendentes = set()
+        nomes = {}
+        usados = set()
+        proximo = primeiro
+        
+        while proximo is not fim or pendentes:
+            while proximo is not fim and len(pendentes) < MAX_MEMBROS_EM_VOO:
+                nome, dados = proximo
+                if isinstance(dados, MembroInvalido):
+                    manifesto.append({"source": nome, "success": False, "error": str(dados)})
+                else:
+                    tarefa = asyncio.ensure_future(
+                        executar(processar_membro, nome, dados, operacoes, output_format, profile)
+                    )
+                    pendentes.add(tarefa)
+                    nomes[tarefa] = nome
+                try:
+                    proximo = await executar(next, membros, fim)
+                except Exception as e:
+                    # Arquivo corrompido no meio da leitura: fecha o ZIP com o
+                    # que já foi processado e registra o erro no manifesto.
+                    manifesto.append({"source": file.filename, "success": False,
+                                      "error": f"Erro ao ler o arquivo: {e}"})
+                    proximo = fim
+            
+            if not pendentes:
+                continue
+            concluidos, pendentes = await asyncio.wait(pendentes, return_when=asyncio.FIRST_COMPLETED)
+            for tarefa in concluidos:
+                nome = nomes.pop(tarefa)
+                try:
+                    nome_saida, dados_saida, entrada = tarefa.result()
+                except Exception as e:
+                    manifesto.append({"source": nome, "success": False, "error": str(e)})
+                    continue
+                if nome_saida in usados:
+                    caminho = PurePosixPath(nome_saida)
+                    nome_saida = str(caminho.with_name(f"{caminho.stem}_{len(usados)}{caminho.suffix}"))
+                    entrada["output"] = nome_saida
+                usados.add(nome_saida)
+                zip_saida.adicionar(nome_saida, dados_saida)
+                manifesto.append(entrada)
+            yield zip_saida.drenar()
+        
+        resumo = {
+            "total": len(manifesto),
+            "success": sum(1 for entrada in manifesto if entrada["success"]),
+            "settings": {"brightness": brightness, "contrast": contrast, "saturation": saturation,
+                         "output_format": output_format, "profile": profile},
+            "files": manifesto
+        }
+        zip_saida.adicionar("manifest.json", json.dumps(resumo, indent=2).encode(), zipfile.ZIP_DEFLATED)
+        yield zip_saida.fechar()
+    
+    return StreamingResponse(
+        gerar_zip(),
+        media_type="application/zip",
+        headers={"Content-Disposition": 'attachment; filename="processed.zip"'}
+    )
+
+
+TAMANHO_TILE = int(os.environ.get("API_TAMANHO_TILE", 256))
+cache_tiles = CacheTiles(
+    Path("temp/tiles"),
+    max_bytes=int(os.environ.get("API_CACHE_TILES_MB", 512)) * 1024 * 1024
+)
+# Origens decodificadas por (arquivo, versão, nível) para os tiles em rajada.
+imagens_tiles = ImagensDecodificadas(max_itens=int(os.environ.get("API_TILES_IMAGENS_DECODIFICADAS", 4)))
+
+
+def localizar_imagem(image_id: str, processed: bool) -> Path:
+    if processed:
+        files = list(OUTPUT_DIR.glob(f"{image_id}_processed.*"))
+    else:
+        files = list(UPLOAD_DIR.glob(f"{image_id}.*"))
+    if not files:
+        raise HTTPException(status_code=404, detail="Imagem não encontrada")
+    return files[0]
+
+
+def renderizar_tile(file_path: Path, tile_path: Path, level: int, x: int, y: int, formato: str) -> bytes:
+    chave = (str(file_path), file_path.stat().st_mtime_ns, level)
+    processador = imagens_tiles.obter(
+        chave, lambda: ProcessadorImagem(str(file_path), manter_original=False).preparar_nivel(level)
+    )
+    tile = processador.gerar_tile(level, x, y, TAMANHO_TILE)
+    if formato == 'JPEG' and tile.mode not in ('RGB', 'L'):
+        tile = tile.convert('RGB')
+    
+    buffer = io.BytesIO()
+    tile.save(buffer, format=formato, **PERFIS_CODIFICACAO["rapido"][formato])
+    dados = buffer.getvalue()
+    
+    tile_path.parent.mkdir(parents=True, exist_ok=True)
+    with escrita_atomica(tile_path) as temporario:
+        temporario.write_bytes(dados)
+    return dados
+
+
+@app.get("/tiles/{image_id}/info")
+async def get_tiles_info(image_id: str, processed: bool = False):
+    try:
+        file_path = localizar_imagem(image_id, processed)
+        info = await executar(ler_info, file_path)
+        niveis = niveis_piramide(info['largura'], info['altura'])
+        return {
+            "image_id": image_id,
+            "processed": processed,
+            "width": info['largura'],
+            "height": info['altura'],
+            "tile_size": TAMANHO_TILE,
+            "levels": niveis,
+            "max_level": niveis - 1
+        }
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Erro ao obter pirâmide: {str(e)}")
+
+
+@app.get("/tiles/{image_id}/{level}/{x}/{y}")
+async def get_tile(
+    request: Request,
+    image_id: str,
+    level: int,
+    x: int,
+    y: int,
+    processed: bool = False,
+    format: str = "jpeg"
+):
+    try:
+        formato = format.upper().replace('JPG', 'JPEG')
+        if formato not in EXTENSOES_FORMATO:
+            raise HTTPException(status_code=400, detail="Formato deve ser jpeg, png ou webp")
+        
+        file_path = localizar_imagem(image_id, processed)
+        etag = gerar_etag(file_path, "tile", TAMANHO_TILE, level, x, y, formato)
+        headers = cabecalhos_cache(file_path, etag, "tiles", processed)
+        if nao_modificado(request, file_path, etag):
+            return Response(status_code=304, headers=headers)
+        
+        variante = "processed" if processed else "original"
+        tile_path = cache_tiles.caminho(
+            image_id, variante, file_path.stat().st_mtime_ns, level, x, y, EXTENSOES_FORMATO[formato]
+        )
+        dados = await executar(cache_tiles.obter, tile_path)
+        if dados is None:
+            try:
+                dados = await executar(renderizar_tile, file_path, tile_path, level, x, y, formato)
+            except ValueError as e:
+                raise HTTPException(status_code=404, detail=str(e))
+            await executar(cache_tiles.registrar_escrita)
+        
+        return Response(content=dados, media_type=f"image/{formato.lower()}", headers=headers)
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Erro ao gerar tile: {str(e)}")
+
+
+presets = RepositorioPresets(Path("temp/presets"))
+
+
+def listar_ids(padrao: str) -> List[str]:
+    ids = set()
+    for file_path in UPLOAD_DIR.iterdir():
+        if file_path.name.startswith('.') or not file_path.is_file():
+            continue
+        if fnmatch.fnmatchcase(file_path.stem, padrao):
+            ids.add(file_path.stem)
+    return sorted(ids)
+
+
+@app.get("/presets")
+async def list_presets():
+    return {"presets": await executar(presets.listar)}
+
+
+@app.get("/presets/{name}")
+async def get_preset(name: str):
+    try:
+        preset = await executar(presets.obter, name)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if preset is None:
+        raise HTTPException(status_code=404, detail="Preset não encontrado")
+    return preset
+
+
+@app.put("/presets/{name}")
+async def save_preset(name: str, preset: Preset):
+    try:
+        operacoes = [operacao.model_dump() for operacao in preset.operations]
+        return await executar(presets.salvar, name, operacoes, preset.description)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@app.delete("/presets/{name}")
+async def delete_preset(name: str):
+    try:
+        removido = await executar(presets.remover, name)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if not removido:
+        raise HTTPException(status_code=404, detail="Preset não encontrado")
+    return {"success": True, "message": f"Preset {name} deletado com sucesso"}
+
+
+@app.post("/presets/{name}/apply")
+async def apply_preset(name: str, pedido: ApplyPresetRequest):
+    try:
+        preset = await executar(presets.obter, name)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if preset is None:
+        raise HTTPException(status_code=404, detail="Preset não encontrado")
+    if pedido.image_ids is None and pedido.filter is None:
+        raise HTTPException(status_code=400, detail="Informe image_ids ou filter")
+    
+    try:
+        operacoes = await executar(validar_operacoes, preset["operations"])
+    except (ValueError, KeyError, TypeError, AttributeError) as e:
+        raise HTTPException(status_code=422, detail=f"Preset armazenado inválido: {e}")
+    image_ids = pedido.image_ids or []
+    if pedido.filter is not None:
+        image_ids = [*image_ids, *await executar(listar_ids, pedido.filter)]
+    image_ids = list(dict.fromkeys(image_ids))
+    
+    limite = asyncio.Semaphore(MAX_MEMBROS_EM_VOO)
+    
+    async def aplicar(image_id: str) -> dict:
+        if any(c in image_id for c in "*?[]/\\"):
+            return {"id": image_id, "success": False, "error": "Id inválido"}
+        input_files = [f for f in UPLOAD_DIR.glob(f"{image_id}.*") if not f.name.startswith('.')]
+        if not input_files:
+            return {"id": image_id, "success": False, "error": "Imagem não encontrada"}
+        async with limite:
+            try:
+                relatorio = await processar_coalescido(image_id, input_files[0], operacoes)
+            except Exception as e:
+                return {"id": image_id, "success": False, "error": str(e)}
+        return {"id": image_id, "success": True, "encoding": relatorio}
+    
+    results = await asyncio.gather(*(aplicar(image_id) for image_id in image_ids))
+    sucesso = sum(1 for r in results if r["success"])
+    return {
+        "success": sucesso == len(results),
+        "message": f"{sucesso} de {len(results)} imagens processadas com o preset {name}",
+        "preset": name,
+        "results": results
+    }
+
+
 if __name__ == "__main__":
     import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=8000, reload=True)
+    # reload exige a aplicação como string de importação; para vários workers use start_api.py --producao.
+    uvicorn.run("api:app", host="0.0.0.0", port=8000, reload=True)
@@ -0,0 +1,86 @@
+"""
+Bloqueios entre processos baseados em arquivo
+
+Com vários workers do uvicorn, cada processo tem sua própria memória; o
+estado compartilhado (imagens, saídas, caches) fica em disco e as escritas
+concorrentes para o mesmo image_id são serializadas por um lock de arquivo.
+"""
+
+import os
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+    import msvcrt
+
+LOCK_DIR = Path("temp/locks")
+LOCK_DIR.mkdir(parents=True, exist_ok=True)
+
+
+def _abrir_travado(caminho: Path) -> int:
+    while True:
+        fd = os.open(caminho, os.O_RDWR | os.O_CREAT, 0o644)
+        if fcntl is None:
+            msvcrt.locking(fd, msvcrt.LK_LOCK, 1)
+            return fd
+        
+        fcntl.flock(fd, fcntl.LOCK_EX)
+        # Quem apaga o arquivo (remover=True) o faz com o lock adquirido; quem
+        # estava esperando no arquivo antigo tenta de novo no atual.
+        try:
+            if os.path.samestat(os.fstat(fd), os.stat(caminho)):
+                return fd
+        except FileNotFoundError:
+            pass
+        os.close(fd)
+
+
+@contextmanager
+def bloqueio_arquivo(chave: str, remover: bool = False):
+    """
+    Lock exclusivo para `chave`, válido entre threads e entre processos. Com
+    `remover=True` o arquivo de lock é apagado ao final (ex.: ao deletar a imagem).
+    """
+    caminho = LOCK_DIR / f"{chave}.lock"
+    fd = _abrir_travado(caminho)
+    try:
+        try:
+            yield
+        finally:
+            if remover:
+                try:
+                    os.unlink(caminho)
+                except OSError:
+                    # No Windows não é possível apagar um arquivo aberto; fica para a próxima.
+                    pass
+            if fcntl is not None:
+                fcntl.flock(fd, fcntl.LOCK_UN)
+            else:
+                os.lseek(fd, 0, os.SEEK_SET)
+                msvcrt.locking(fd, msvcrt.LK_UNLCK, 1)
+    finally:
+        os.close(fd)
+
+
+def caminho_temporario(caminho: Path) -> Path:
+    """Nome temporário no mesmo diretório, preservando a extensão e fora do glob `{id}.*`."""
+    return caminho.with_name(f".tmp-{os.getpid()}-{threading.get_ident()}-{caminho.name}")
+
+
+@contextmanager
+def escrita_atomica(caminho: Path):
+    """
+    Entrega um caminho temporário para escrita e o renomeia para `caminho` ao
+    final, de modo que nenhum worker enxergue um arquivo parcialmente escrito.
+    """
+    temporario = caminho_temporario(caminho)
+    try:
+        yield temporario
+        os.replace(temporario, caminho)
+    finally:
+        if temporario.exists():
+            temporario.unlink()
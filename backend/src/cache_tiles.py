@@ -0,0 +1,138 @@
+"""
+Cache em disco dos tiles da pirâmide Deep Zoom
+
+Os tiles ficam em `temp/tiles/{image_id}/{variante}-{versao}/{nivel}/{x}_{y}.{ext}`.
+A versão é o mtime da imagem de origem, então reprocessar uma imagem
+invalida os tiles antigos sem precisar apagá-los na hora: eles deixam de
+ser lidos e saem pela evicção LRU (mtime atualizado a cada acerto) quando o
+cache passa do limite de bytes.
+
+`ImagensDecodificadas` guarda as últimas imagens de origem já decodificadas
+por nível, para que a rajada de tiles que um visualizador pede ao abrir um
+nível custe uma decodificação, e não uma por tile.
+"""
+
+import os
+import shutil
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Callable, Hashable, Optional
+
+from bloqueio import bloqueio_arquivo
+
+
+class CacheTiles:
+
+    def __init__(self, diretorio: Path, max_bytes: int, evictar_a_cada: int = 200):
+        self.diretorio = diretorio
+        self.max_bytes = max_bytes
+        self.evictar_a_cada = evictar_a_cada
+        self._escritas = 0
+        self._escritas_lock = threading.Lock()
+        self.diretorio.mkdir(parents=True, exist_ok=True)
+
+    def _diretorio_imagem(self, image_id: str) -> Path:
+        diretorio = (self.diretorio / image_id).resolve()
+        if diretorio.parent != self.diretorio.resolve():
+            raise ValueError(f"Id de imagem inválido: {image_id!r}")
+        return diretorio
+
+    def caminho(self, image_id: str, variante: str, versao: int, nivel: int, x: int, y: int, extensao: str) -> Path:
+        self._diretorio_imagem(image_id)
+        return self.diretorio / image_id / f"{variante}-{versao}" / str(nivel) / f"{x}_{y}{extensao}"
+
+    def obter(self, caminho: Path) -> Optional[bytes]:
+        """Lê o tile do cache (marcando-o como recente) ou retorna None."""
+        try:
+            os.utime(caminho)
+            with open(caminho, "rb") as arquivo:
+                return arquivo.read()
+        except FileNotFoundError:
+            return None
+
+    def registrar_escrita(self):
+        with self._escritas_lock:
+            self._escritas += 1
+            evictar = self._escritas % self.evictar_a_cada == 0
+        if evictar:
+            self.evictar()
+
+    def evictar(self):
+        """Remove os tiles menos usados até o cache caber em `max_bytes`."""
+        with bloqueio_arquivo("cache-tiles"):
+            arquivos = []
+            total = 0
+            for raiz, _, nomes in os.walk(self.diretorio):
+                for nome in nomes:
+                    caminho = os.path.join(raiz, nome)
+                    try:
+                        stat = os.stat(caminho)
+                    except FileNotFoundError:
+                        continue
+                    arquivos.append((stat.st_mtime, stat.st_size, caminho))
+                    total += stat.st_size
+
+            if total <= self.max_bytes:
+                return
+
+            arquivos.sort()
+            for _, tamanho, caminho in arquivos:
+                if total <= self.max_bytes:
+                    break
+                try:
+                    os.unlink(caminho)
+                except FileNotFoundError:
+                    pass
+                total -= tamanho
+
+            # Diretórios vazios de versões antigas; os recentes podem estar
+            # prestes a receber um tile, então só remove os parados há um tempo.
+            limite = time.time() - 60
+            for raiz, _, _ in os.walk(self.diretorio, topdown=False):
+                if raiz == str(self.diretorio):
+                    continue
+                try:
+                    if os.stat(raiz).st_mtime < limite:
+                        os.rmdir(raiz)
+                except OSError:
+                    pass
+
+    def remover_imagem(self, image_id: str):
+        shutil.rmtree(self._diretorio_imagem(image_id), ignore_errors=True)
+
+
+class ImagensDecodificadas:
+    """
+    LRU pequeno de valores caros de carregar. Chamadas concorrentes com a
+    mesma chave esperam a primeira carregar em vez de repetir o trabalho.
+    """
+
+    def __init__(self, max_itens: int = 4):
+        self.max_itens = max_itens
+        self._itens: "OrderedDict[Hashable, Any]" = OrderedDict()
+        self._travas = {}
+        self._lock = threading.Lock()
+
+    def obter(self, chave: Hashable, carregar: Callable[[], Any]) -> Any:
+        with self._lock:
+            if chave in self._itens:
+                self._itens.move_to_end(chave)
+                return self._itens[chave]
+            trava = self._travas.setdefault(chave, threading.Lock())
+
+        with trava:
+            with self._lock:
+                if chave in self._itens:
+                    return self._itens[chave]
+            try:
+                valor = carregar()
+                with self._lock:
+                    self._itens[chave] = valor
+                    while len(self._itens) > self.max_itens:
+                        self._itens.popitem(last=False)
+            finally:
+                with self._lock:
+                    self._travas.pop(chave, None)
+            return valor
@@ -0,0 +1,30 @@
+"""
+Coalescência de requisições (single-flight)
+
+Requisições concorrentes idênticas (mesmo image_id, operação e parâmetros)
+aguardam uma única execução em andamento e compartilham o resultado, em vez
+de cada uma decodificar e processar a imagem de novo. A coalescência é por
+processo; entre workers, as escritas no mesmo image_id continuam
+serializadas pelo lock de arquivo de `bloqueio`.
+"""
+
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Hashable
+
+
+class Coalescedor:
+
+    def __init__(self):
+        self._em_voo: Dict[Hashable, asyncio.Future] = {}
+        self.coalescidas = 0
+
+    async def executar(self, chave: Hashable, funcao: Callable[..., Awaitable[Any]], *args) -> Any:
+        futuro = self._em_voo.get(chave)
+        if futuro is None:
+            futuro = asyncio.ensure_future(funcao(*args))
+            self._em_voo[chave] = futuro
+            futuro.add_done_callback(lambda _: self._em_voo.pop(chave, None))
+        else:
+            self.coalescidas += 1
+        # shield: se um dos clientes cancelar, a execução compartilhada continua para os demais
+        return await asyncio.shield(futuro)
@@ -0,0 +1,106 @@
+"""
+Estatísticas das imagens originais, calculadas uma vez por upload
+
+Histogramas por canal, percentis 2/98, luminância média, dimensões e modo
+ficam em um JSON ao lado da imagem (`.{image_id}.stats.json`; o ponto
+inicial evita que o arquivo case com o glob `{image_id}.*` usado para achar
+a original). O arquivo guarda tamanho e mtime da imagem e é ignorado se
+eles não baterem.
+"""
+
+import json
+import os
+from pathlib import Path
+from typing import Optional
+
+import numpy as np
+
+from bloqueio import escrita_atomica
+from processamento_imagem import ProcessadorImagem, percentis_histograma
+
+VERSAO = 1
+
+# Pesos ITU-R BT.601, os mesmos da conversão RGB -> L do Pillow.
+PESOS_LUMINANCIA = {'red': 0.299, 'green': 0.587, 'blue': 0.114}
+
+
+def caminho_estatisticas(caminho_imagem: Path) -> Path:
+    return caminho_imagem.with_name(f".{caminho_imagem.stem}.stats.json")
+
+
+def _origem(caminho_imagem: Path) -> dict:
+    stat = caminho_imagem.stat()
+    return {'bytes': stat.st_size, 'mtime_ns': stat.st_mtime_ns}
+
+
+def _media(contagens) -> float:
+    contagens = np.asarray(contagens)
+    return float(np.dot(contagens, np.arange(len(contagens))) / max(contagens.sum(), 1))
+
+
+def calcular_estatisticas(caminho_imagem: Path) -> dict:
+    origem = _origem(caminho_imagem)
+    processador = ProcessadorImagem(str(caminho_imagem), manter_original=False)
+    info = processador.obter_info()
+    histograma = processador.gerar_histograma()
+
+    # Em 'P' o histograma conta índices da paleta e em CMYK/LA os canais não são
+    # RGB; nesses modos a luminância vem da conversão para L do Pillow.
+    imagem = processador.imagem_processada
+    if imagem.mode in ('L', 'RGB', 'RGBA'):
+        medias = {canal: _media(contagens) for canal, contagens in histograma.items()}
+        if 'gray' in medias:
+            luminancia = medias['gray']
+        else:
+            luminancia = sum(PESOS_LUMINANCIA[canal] * media for canal, media in medias.items())
+    else:
+        luminancia = _media(imagem.convert('L').histogram())
+
+    # Para imagens de 8 bits os percentis do histograma são idênticos aos de
+    # `percentis_canal`; nas demais o ajuste automático calcula sobre os pixels.
+    percentis = None
+    if processador.obter_array().dtype == np.uint8:
+        percentis = {canal: percentis_histograma(np.asarray(contagens), (2, 98))
+                     for canal, contagens in histograma.items()}
+
+    return {
+        'versao': VERSAO,
+        'origem': origem,
+        'formato': info['formato'],
+        'modo': info['modo'],
+        'largura': info['largura'],
+        'altura': info['altura'],
+        'quadros': info['quadros'],
+        'luminancia_media': round(luminancia, 3),
+        'percentis': percentis,
+        'histograma': histograma
+    }
+
+
+def gravar_estatisticas(caminho_imagem: Path) -> dict:
+    estatisticas = calcular_estatisticas(caminho_imagem)
+    with escrita_atomica(caminho_estatisticas(caminho_imagem)) as temporario:
+        temporario.write_text(json.dumps(estatisticas, separators=(',', ':')), encoding='utf-8')
+    return estatisticas
+
+
+def ler_estatisticas(caminho_imagem: Path) -> Optional[dict]:
+    """Retorna as estatísticas gravadas, ou None se não existem ou estão desatualizadas."""
+    try:
+        estatisticas = json.loads(caminho_estatisticas(caminho_imagem).read_text(encoding='utf-8'))
+        if estatisticas.get('versao') == VERSAO and estatisticas.get('origem') == _origem(caminho_imagem):
+            return estatisticas
+    except (OSError, ValueError):
+        pass
+    return None
+
+
+def obter_estatisticas(caminho_imagem: Path) -> dict:
+    return ler_estatisticas(caminho_imagem) or gravar_estatisticas(caminho_imagem)
+
+
+def remover_estatisticas(caminho_imagem: Path):
+    try:
+        os.unlink(caminho_estatisticas(caminho_imagem))
+    except FileNotFoundError:
+        pass
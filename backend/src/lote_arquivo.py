@@ -0,0 +1,115 @@
+"""
+Leitura e escrita de arquivos ZIP/TAR em streaming para processamento em lote
+
+`iterar_membros` percorre um ZIP ou TAR membro a membro, sem extrair o
+arquivo inteiro. `ZipStreaming` escreve um ZIP em um buffer que é esvaziado
+a cada membro, permitindo enviar a resposta enquanto o lote ainda processa.
+"""
+
+import tarfile
+import zipfile
+from pathlib import PurePosixPath
+from typing import BinaryIO, Iterator, Tuple
+
+EXTENSOES_IMAGEM = {'.jpg', '.jpeg', '.png', '.webp', '.bmp', '.gif', '.tif', '.tiff'}
+
+# Membros maiores que isso são recusados (proteção contra zip bombs).
+MAX_BYTES_MEMBRO = 100 * 1024 * 1024
+
+
+class MembroInvalido(Exception):
+    pass
+
+
+def nome_seguro(nome: str) -> str:
+    """Remove componentes absolutos e '..' do caminho de um membro."""
+    partes = [p for p in PurePosixPath(nome.replace('\\', '/')).parts if p not in ('', '.', '..', '/')]
+    return '/'.join(partes)
+
+
+def _eh_imagem(nome: str) -> bool:
+    caminho = PurePosixPath(nome)
+    return caminho.suffix.lower() in EXTENSOES_IMAGEM and not caminho.name.startswith('.')
+
+
+def iterar_membros(arquivo: BinaryIO) -> Iterator[Tuple[str, bytes]]:
+    """
+    Gera (nome, bytes) para cada imagem de um ZIP ou TAR (comprimido ou não).
+    Membros grandes demais ou ilegíveis (CRC inválido, TAR truncado) geram
+    (nome, MembroInvalido) em vez dos bytes. Um TAR é lido em sequência, então
+    depois de um membro ilegível o restante dele é descartado.
+    """
+    arquivo.seek(0)
+    if zipfile.is_zipfile(arquivo):
+        arquivo.seek(0)
+        with zipfile.ZipFile(arquivo) as zip_entrada:
+            for info in zip_entrada.infolist():
+                if info.is_dir() or not _eh_imagem(info.filename):
+                    continue
+                if info.file_size > MAX_BYTES_MEMBRO:
+                    yield info.filename, MembroInvalido("Membro excede o tamanho máximo")
+                    continue
+                try:
+                    dados = zip_entrada.read(info)
+                except Exception as e:
+                    yield info.filename, MembroInvalido(f"Membro ilegível: {e}")
+                    continue
+                yield info.filename, dados
+        return
+
+    arquivo.seek(0)
+    try:
+        tar_entrada = tarfile.open(fileobj=arquivo, mode='r|*')
+    except tarfile.TarError:
+        raise ValueError("Arquivo deve ser um ZIP ou TAR")
+    with tar_entrada:
+        for membro in tar_entrada:
+            if not membro.isfile() or not _eh_imagem(membro.name):
+                continue
+            if membro.size > MAX_BYTES_MEMBRO:
+                yield membro.name, MembroInvalido("Membro excede o tamanho máximo")
+                continue
+            try:
+                dados = tar_entrada.extractfile(membro).read()
+            except Exception as e:
+                yield membro.name, MembroInvalido(f"Membro ilegível: {e}")
+                return
+            yield membro.name, dados
+
+
+class _BufferSaida:
+    """Destino não posicionável para o ZipFile; acumula bytes até serem drenados."""
+
+    def __init__(self):
+        self._partes = []
+
+    def write(self, dados) -> int:
+        self._partes.append(bytes(dados))
+        return len(dados)
+
+    def flush(self):
+        pass
+
+    def drenar(self) -> bytes:
+        dados = b''.join(self._partes)
+        self._partes.clear()
+        return dados
+
+
+class ZipStreaming:
+    """ZIP de saída escrito incrementalmente; cada chamada a `drenar` devolve os bytes novos."""
+
+    def __init__(self):
+        self._buffer = _BufferSaida()
+        # Imagens já são comprimidas; ZIP_STORED evita gastar CPU à toa.
+        self._zip = zipfile.ZipFile(self._buffer, mode='w', compression=zipfile.ZIP_STORED)
+
+    def adicionar(self, nome: str, dados: bytes, compressao: int = zipfile.ZIP_STORED):
+        self._zip.writestr(nome, dados, compress_type=compressao)
+
+    def drenar(self) -> bytes:
+        return self._buffer.drenar()
+
+    def fechar(self) -> bytes:
+        self._zip.close()
+        return self._buffer.drenar()
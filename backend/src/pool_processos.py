@@ -0,0 +1,222 @@
+"""
+Pool de processos worker com transferência de pixels por memória compartilhada
+
+O processo pai copia o buffer de trabalho para um bloco de
+`multiprocessing.shared_memory` e envia ao worker só o nome do bloco, a forma
+e a lista de operações. O worker lê os pixels direto do bloco (sem cópia nem
+pickle), aplica as operações do ProcessadorImagem e escreve o resultado no
+mesmo bloco. Os blocos são reaproveitados entre chamadas, e os workers
+mantêm os blocos já anexados abertos (limitados em bytes, e fechados quando o
+pai avisa que os apagou).
+
+Se um worker morre (ex.: OOM killer), o executor quebrado é descartado e a
+chamada é repetida uma vez em um executor novo; se falhar de novo, as
+operações rodam no próprio processo.
+"""
+
+import multiprocessing
+import sys
+import threading
+from collections import OrderedDict, deque
+from concurrent.futures import ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from multiprocessing import resource_tracker, shared_memory
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+# Abaixo disso o custo de ida e volta ao worker supera o ganho.
+MIN_BYTES_PADRAO = 1024 * 1024
+
+# Bytes de blocos anexados mantidos abertos em cada worker.
+MAX_BYTES_ANEXADOS = 256 * 1024 * 1024
+
+# Quantos nomes de blocos apagados o pai repassa aos workers a cada tarefa.
+MAX_LIBERADOS = 64
+
+_anexados: "OrderedDict[str, shared_memory.SharedMemory]" = OrderedDict()
+
+
+def _fechar_liberados(liberados: Sequence[str]):
+    for nome in liberados:
+        bloco = _anexados.pop(nome, None)
+        if bloco is not None:
+            bloco.close()
+
+
+def _anexar(nome: str) -> shared_memory.SharedMemory:
+    bloco = _anexados.get(nome)
+    if bloco is not None:
+        _anexados.move_to_end(nome)
+        return bloco
+
+    if sys.version_info >= (3, 13):
+        bloco = shared_memory.SharedMemory(name=nome, track=False)
+    else:
+        # Antes do 3.13, anexar registra o bloco no resource_tracker, que o
+        # apagaria quando o worker terminasse; quem o apaga é o processo pai.
+        registrar = resource_tracker.register
+        resource_tracker.register = lambda *args, **kwargs: None
+        try:
+            bloco = shared_memory.SharedMemory(name=nome)
+        finally:
+            resource_tracker.register = registrar
+
+    _anexados[nome] = bloco
+    total = sum(anexado.size for anexado in _anexados.values())
+    while total > MAX_BYTES_ANEXADOS and len(_anexados) > 1:
+        _, antigo = _anexados.popitem(last=False)
+        total -= antigo.size
+        antigo.close()
+    return bloco
+
+
+def _aplicar_operacoes(pixels: np.ndarray, operacoes: List[tuple]) -> np.ndarray:
+    from processamento_imagem import ProcessadorImagem
+
+    processador = ProcessadorImagem.de_array(pixels)
+    for nome_operacao, args, kwargs in operacoes:
+        getattr(processador, nome_operacao)(*args, **kwargs)
+
+    resultado = processador.obter_array()
+    if resultado.shape != pixels.shape or resultado.dtype != np.uint8:
+        raise ValueError(f"Operações alteraram a forma da imagem: {pixels.shape} -> {resultado.shape}")
+    return resultado
+
+
+def _executar_no_worker(nome: str, forma: Tuple[int, ...], operacoes: List[tuple], liberados: List[str]):
+    _fechar_liberados(liberados)
+    bloco = _anexar(nome)
+    pixels = np.ndarray(forma, dtype=np.uint8, buffer=bloco.buf)
+    resultado = _aplicar_operacoes(pixels, operacoes)
+    if resultado is not pixels:
+        np.copyto(pixels, resultado)
+
+
+class BlocosCompartilhados:
+    """Blocos de memória compartilhada reaproveitáveis, agrupados por tamanho (potências de 2)."""
+
+    def __init__(self, max_bytes_livres: int):
+        self.max_bytes_livres = max_bytes_livres
+        self._livres: Dict[int, List[shared_memory.SharedMemory]] = {}
+        self._bytes_livres = 0
+        self._lock = threading.Lock()
+        self._liberados = deque(maxlen=MAX_LIBERADOS)
+
+    def liberados(self) -> List[str]:
+        """Nomes dos últimos blocos apagados, para os workers fecharem suas cópias anexadas."""
+        with self._lock:
+            return list(self._liberados)
+
+    def _apagar(self, bloco: shared_memory.SharedMemory):
+        with self._lock:
+            self._liberados.append(bloco.name)
+        bloco.close()
+        bloco.unlink()
+
+    def obter(self, nbytes: int) -> shared_memory.SharedMemory:
+        tamanho = 1 << max(nbytes - 1, 0).bit_length()
+        with self._lock:
+            livres = self._livres.get(tamanho)
+            if livres:
+                self._bytes_livres -= tamanho
+                return livres.pop()
+        return shared_memory.SharedMemory(create=True, size=tamanho)
+
+    def devolver(self, bloco: shared_memory.SharedMemory):
+        with self._lock:
+            if self._bytes_livres + bloco.size <= self.max_bytes_livres:
+                self._livres.setdefault(bloco.size, []).append(bloco)
+                self._bytes_livres += bloco.size
+                return
+        self._apagar(bloco)
+
+    def fechar(self):
+        with self._lock:
+            blocos = [bloco for livres in self._livres.values() for bloco in livres]
+            self._livres.clear()
+            self._bytes_livres = 0
+        for bloco in blocos:
+            self._apagar(bloco)
+
+
+class PoolProcessos:
+    """
+    Executa listas de operações do ProcessadorImagem em processos worker.
+    Os processos só são criados na primeira chamada. `min_bytes` é o tamanho
+    mínimo de imagem para valer a pena sair do processo atual.
+    """
+
+    def __init__(self, workers: Optional[int] = None, min_bytes: int = MIN_BYTES_PADRAO,
+                 max_bytes_livres: int = 256 * 1024 * 1024):
+        self.workers = workers or multiprocessing.cpu_count()
+        self.min_bytes = min_bytes
+        self.blocos = BlocosCompartilhados(max_bytes_livres)
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+
+    def _obter_executor(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                # spawn: o processo da API tem threads, e fork com threads ativas
+                # pode herdar locks travados.
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers, mp_context=multiprocessing.get_context("spawn")
+                )
+            return self._executor
+
+    def aplicar(self, array: np.ndarray, operacoes: Sequence[Tuple[str, tuple, Dict[str, Any]]]) -> np.ndarray:
+        """Aplica `operacoes` [(nome, args, kwargs), ...] a uma imagem uint8 em um worker."""
+        return self.aplicar_varios([array], operacoes)[0]
+
+    def aplicar_varios(self, arrays: Sequence[np.ndarray],
+                       operacoes: Sequence[Tuple[str, tuple, Dict[str, Any]]]) -> List[np.ndarray]:
+        """Como `aplicar`, para várias imagens distribuídas entre os workers."""
+        operacoes = list(operacoes)
+        for array in arrays:
+            if array.dtype != np.uint8:
+                raise ValueError("O pool de processos só aceita imagens uint8")
+
+        for _ in range(2):
+            executor = self._obter_executor()
+            try:
+                return self._aplicar_no_executor(executor, arrays, operacoes)
+            except BrokenProcessPool:
+                self._descartar_executor(executor)
+        return [_aplicar_operacoes(array, operacoes).copy() for array in arrays]
+
+    def _descartar_executor(self, executor: ProcessPoolExecutor):
+        with self._lock:
+            if self._executor is executor:
+                self._executor = None
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    def _aplicar_no_executor(self, executor: ProcessPoolExecutor, arrays: Sequence[np.ndarray],
+                             operacoes: List[tuple]) -> List[np.ndarray]:
+        blocos = []
+        futuros = []
+        try:
+            liberados = self.blocos.liberados()
+            for array in arrays:
+                bloco = self.blocos.obter(array.nbytes)
+                blocos.append(bloco)
+                np.copyto(np.ndarray(array.shape, dtype=np.uint8, buffer=bloco.buf), array)
+                futuros.append(executor.submit(_executar_no_worker, bloco.name, array.shape, operacoes, liberados))
+
+            resultados = []
+            for futuro, bloco, array in zip(futuros, blocos, arrays):
+                futuro.result()
+                resultados.append(np.ndarray(array.shape, dtype=np.uint8, buffer=bloco.buf).copy())
+            return resultados
+        finally:
+            # Um bloco só volta ao pool quando nenhum worker pode mais escrever nele.
+            wait(futuros)
+            for bloco in blocos:
+                self.blocos.devolver(bloco)
+
+    def fechar(self):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown()
+        self.blocos.fechar()
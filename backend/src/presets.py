@@ -0,0 +1,119 @@
+"""
+Presets de processamento guardados no servidor
+
+Um preset é uma lista ordenada de operações do ProcessadorImagem com seus
+parâmetros, salva como JSON em disco (compartilhado entre workers). A lista
+é convertida para o formato `[(nome_do_metodo, parametros), ...]` usado por
+`processar_e_salvar` na API.
+"""
+
+import inspect
+import json
+import os
+import re
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from bloqueio import escrita_atomica
+from processamento_imagem import ProcessadorImagem
+
+OPERACOES_PRESET = (
+    'ajustar_brilho', 'ajustar_contraste', 'ajustar_saturacao', 'ajustar_brilho_contraste',
+    'ajuste_automatico', 'aplicar_clahe', 'aplicar_curva_s'
+)
+
+# Mesmas faixas aceitas pelos endpoints de processamento.
+FAIXAS_PARAMETROS = {
+    'fator': (0.0, 3.0),
+    'fator_brilho': (0.0, 3.0),
+    'fator_contraste': (0.0, 3.0),
+    'clip_limit': (0.1, 10.0),
+    'tile_grid_size': (1, 32),
+    'intensidade': (0.0, 2.0),
+}
+
+NOME_VALIDO = re.compile(r'^[A-Za-z0-9_-]{1,64}$')
+
+
+def validar_operacoes(operacoes: List[Dict[str, Any]]) -> List[Tuple[str, Dict[str, Any]]]:
+    """
+    Confere nomes e parâmetros contra a assinatura dos métodos do
+    ProcessadorImagem e devolve a lista no formato (nome, parametros). Tipos e
+    faixas de valores são conferidos aplicando as operações a uma imagem
+    mínima, para que um preset inválido falhe ao ser salvo e não em cada imagem.
+    """
+    if not operacoes:
+        raise ValueError("O preset deve ter ao menos uma operação")
+
+    validadas = []
+    for indice, operacao in enumerate(operacoes):
+        nome = operacao.get('operation')
+        parametros = dict(operacao.get('params') or {})
+        if nome not in OPERACOES_PRESET:
+            raise ValueError(f"Operação {indice}: '{nome}' inválida. Use: {', '.join(OPERACOES_PRESET)}")
+        try:
+            inspect.signature(getattr(ProcessadorImagem, nome)).bind(None, **parametros)
+        except TypeError as e:
+            raise ValueError(f"Operação {indice} ({nome}): parâmetros inválidos: {e}")
+        for chave, valor in parametros.items():
+            if isinstance(valor, list):
+                parametros[chave] = tuple(valor)
+            if chave in FAIXAS_PARAMETROS:
+                minimo, maximo = FAIXAS_PARAMETROS[chave]
+                valores = parametros[chave] if isinstance(parametros[chave], tuple) else (parametros[chave],)
+                if not all(isinstance(v, (int, float)) and not isinstance(v, bool) and minimo <= v <= maximo
+                           for v in valores):
+                    raise ValueError(f"Operação {indice} ({nome}): '{chave}' deve estar entre {minimo} e {maximo}")
+        validadas.append((nome, parametros))
+    
+    amostra = np.arange(16 * 16 * 3, dtype=np.uint8).reshape(16, 16, 3)
+    processador = ProcessadorImagem.de_array(amostra)
+    for indice, (nome, parametros) in enumerate(validadas):
+        try:
+            getattr(processador, nome)(**parametros)
+        except Exception as e:
+            raise ValueError(f"Operação {indice} ({nome}): parâmetros inválidos: {e}")
+    return validadas
+
+
+class RepositorioPresets:
+
+    def __init__(self, diretorio: Path):
+        self.diretorio = diretorio
+        self.diretorio.mkdir(parents=True, exist_ok=True)
+
+    def _caminho(self, nome: str) -> Path:
+        if not NOME_VALIDO.match(nome):
+            raise ValueError("Nome de preset inválido (use letras, números, '_' ou '-', até 64 caracteres)")
+        return self.diretorio / f"{nome}.json"
+
+    def salvar(self, nome: str, operacoes: List[Dict[str, Any]], descricao: Optional[str] = None) -> dict:
+        validar_operacoes(operacoes)
+        preset = {'name': nome, 'description': descricao, 'operations': operacoes}
+        with escrita_atomica(self._caminho(nome)) as temporario:
+            temporario.write_text(json.dumps(preset, indent=2, ensure_ascii=False), encoding='utf-8')
+        return preset
+
+    def obter(self, nome: str) -> Optional[dict]:
+        try:
+            return json.loads(self._caminho(nome).read_text(encoding='utf-8'))
+        except FileNotFoundError:
+            return None
+
+    def listar(self) -> List[dict]:
+        presets = []
+        for caminho in sorted(self.diretorio.glob('*.json')):
+            try:
+                presets.append(json.loads(caminho.read_text(encoding='utf-8')))
+            except (OSError, ValueError):
+                continue
+        return presets
+
+    def remover(self, nome: str) -> bool:
+        try:
+            os.unlink(self._caminho(nome))
+            return True
+        except FileNotFoundError:
+            return False
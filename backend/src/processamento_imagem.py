@@ -1,142 +1,531 @@
-from PIL import Image, ImageEnhance
+from PIL import Image, ImageEnhance, ImageSequence
 import numpy as np
-import cv2
-from skimage import exposure
-from typing import Union, Tuple, Dict, List
+from typing import Union, Tuple, Dict, List, Optional, BinaryIO
+from concurrent.futures import ThreadPoolExecutor
+import functools
+import hashlib
+import io
+import math
 import os
+import threading
+import time
+import tracemalloc
+
+
+# Perfis de codificação: trocam tempo de CPU por tamanho em bytes.
+# O Pillow não expõe a escolha de filtro PNG; `optimize` testa todos os filtros.
+PERFIS_CODIFICACAO = {
+    'rapido': {
+        'PNG': {'compress_level': 1},
+        'JPEG': {'quality': 85, 'subsampling': 2, 'optimize': False, 'progressive': False},
+        'WEBP': {'quality': 80, 'method': 0},
+    },
+    'balanceado': {
+        'PNG': {'compress_level': 6},
+        'JPEG': {'quality': 90, 'subsampling': 2, 'optimize': True, 'progressive': False},
+        'WEBP': {'quality': 80, 'method': 4},
+    },
+    'menor': {
+        'PNG': {'compress_level': 9, 'optimize': True},
+        'JPEG': {'quality': 85, 'subsampling': 2, 'optimize': True, 'progressive': True},
+        'WEBP': {'quality': 75, 'method': 6},
+    },
+}
+
+EXTENSOES_FORMATO = {'PNG': '.png', 'JPEG': '.jpg', 'WEBP': '.webp'}
+
+# Formatos em que `salvar` grava todos os quadros (PNG como APNG).
+FORMATOS_MULTIQUADRO = {'GIF': '.gif', 'WEBP': '.webp', 'TIFF': '.tif', 'PNG': '.png'}
+
+
+def _registrar_operacao(metodo):
+    """Guarda a operação para repeti-la nos demais quadros de imagens com vários quadros."""
+    @functools.wraps(metodo)
+    def envolvido(self, *args, **kwargs):
+        if self._operacoes is None or self._registrando:
+            return metodo(self, *args, **kwargs)
+        
+        self._registrando = True
+        try:
+            resultado = metodo(self, *args, **kwargs)
+        finally:
+            self._registrando = False
+        self._operacoes.append((metodo.__name__, args, kwargs))
+        return resultado
+    return envolvido
+
+
+# O tracemalloc é global ao processo: reset_peak/stop de uma medição
+# corromperia outra em andamento em outra thread, então elas são serializadas.
+_LOCK_MEMORIA = threading.RLock()
+
+
+def _medir_memoria(metodo):
+    """
+    Registra pico de alocação e tempo da operação quando o perfil de memória
+    está ativo. Operações medidas rodam uma por vez no processo; alocações de
+    threads não medidas no mesmo intervalo também entram na conta.
+    """
+    @functools.wraps(metodo)
+    def envolvido(self, *args, **kwargs):
+        if self.perfil_memoria is None or self._medindo:
+            return metodo(self, *args, **kwargs)
+        
+        with _LOCK_MEMORIA:
+            return _medir(self, metodo, args, kwargs)
+    return envolvido
+
+
+def _medir(processador, metodo, args, kwargs):
+    iniciou = not tracemalloc.is_tracing()
+    if iniciou:
+        tracemalloc.start()
+    tracemalloc.reset_peak()
+    antes, _ = tracemalloc.get_traced_memory()
+    processador._medindo = True
+    inicio = time.perf_counter()
+    try:
+        return metodo(processador, *args, **kwargs)
+    finally:
+        tempo_ms = (time.perf_counter() - inicio) * 1000
+        atual, pico = tracemalloc.get_traced_memory()
+        processador._medindo = False
+        if iniciou:
+            tracemalloc.stop()
+        processador.perfil_memoria.append({
+            'operacao': metodo.__name__,
+            'pico_bytes': pico - antes,
+            'retido_bytes': atual - antes,
+            'tempo_ms': round(tempo_ms, 2)
+        })
 
 
 class ProcessadorImagem:
+    """
+    Mantém a imagem de trabalho em PIL ou em ndarray, convertendo só quando
+    a próxima operação exige a outra representação. `copias` conta quantas
+    conversões PIL <-> ndarray foram feitas desde o carregamento.
+    
+    Com `manter_original=False` não há cópia da imagem original: o buffer de
+    trabalho começa como a própria imagem decodificada, cujos pixels são
+    liberados assim que a primeira operação a substitui; `resetar` relê a
+    imagem da origem. Com `perfilar_memoria=True`, cada operação registra em
+    `perfil_memoria` o pico de alocação medido pelo tracemalloc (alocações do
+    numpy são rastreadas; as internas do Pillow/OpenCV, não).
+    
+    Em GIFs, WebPs animados e TIFFs com várias páginas as operações agem
+    sobre o primeiro quadro e ficam registradas; ao salvar, são repetidas
+    em paralelo nos demais quadros (uma vez por quadro distinto).
+    
+    Com `pool` (um `pool_processos.PoolProcessos`), `aplicar_operacoes` e a
+    repetição nos quadros rodam em processos worker, com os pixels passados
+    por memória compartilhada.
+    """
     
-    def __init__(self, caminho_imagem: str):
-        if not os.path.exists(caminho_imagem):
+    __slots__ = (
+        'caminho_original', 'imagem', 'copias', 'manter_original', 'perfil_memoria',
+        'num_quadros', 'pool', '_pil', '_array', '_medindo', '_operacoes', '_registrando',
+        '_tamanho', '_nivel_max'
+    )
+    
+    def __init__(self, caminho_imagem: Union[str, BinaryIO], manter_original: bool = True,
+                 perfilar_memoria: bool = False, pool=None):
+        if isinstance(caminho_imagem, (str, os.PathLike)) and not os.path.exists(caminho_imagem):
             raise FileNotFoundError(f"Arquivo não encontrado: {caminho_imagem}")
         
         self.caminho_original = caminho_imagem
-        self.imagem = Image.open(caminho_imagem)
-        self.imagem_processada = self.imagem.copy()
+        self.manter_original = manter_original
+        self.perfil_memoria: Optional[List[dict]] = [] if perfilar_memoria else None
+        self.pool = pool
+        self._medindo = False
+        self._registrando = False
+        self.copias = 0
+        self._array: Optional[np.ndarray] = None
+        self._carregar()
+    
+    @classmethod
+    def _de_buffer(cls, quadro: Optional[Image.Image] = None,
+                   array: Optional[np.ndarray] = None) -> 'ProcessadorImagem':
+        processador = cls.__new__(cls)
+        processador.caminho_original = None
+        processador.imagem = quadro
+        processador.manter_original = False
+        processador.perfil_memoria = None
+        processador.pool = None
+        processador.num_quadros = 1
+        processador.copias = 0
+        processador._pil = quadro
+        processador._array = array
+        processador._medindo = False
+        processador._operacoes = None
+        processador._registrando = False
+        if quadro is not None:
+            processador._tamanho = quadro.size
+        else:
+            processador._tamanho = (array.shape[1], array.shape[0])
+        processador._nivel_max = niveis_piramide(*processador._tamanho) - 1
+        return processador
+    
+    @classmethod
+    def de_array(cls, array: np.ndarray) -> 'ProcessadorImagem':
+        """Processador sobre um ndarray já decodificado, sem arquivo de origem; o array não é copiado."""
+        return cls._de_buffer(array=array)
+    
+    def _abrir(self) -> Image.Image:
+        if not isinstance(self.caminho_original, (str, os.PathLike)):
+            self.caminho_original.seek(0)
+        return Image.open(self.caminho_original)
     
-    def ajustar_brilho(self, fator: float) -> Image.Image:
+    def _carregar(self):
+        self.imagem = self._abrir()
+        # `draft` reduz `self.imagem.size`; a geometria usa sempre o tamanho de origem.
+        self._tamanho = self.imagem.size
+        self._nivel_max = niveis_piramide(*self._tamanho) - 1
+        self.num_quadros = getattr(self.imagem, 'n_frames', 1)
+        self._operacoes: Optional[List[tuple]] = [] if self.num_quadros > 1 else None
+        self._pil: Optional[Image.Image] = self._quadro_inicial()
+    
+    def _quadro_inicial(self) -> Image.Image:
+        if self.num_quadros > 1:
+            # Os quadros seguintes podem vir em outro modo (no GIF o primeiro
+            # é 'P' e os demais RGB/RGBA); todos são processados no mesmo.
+            return self.imagem.convert(modo_quadros(self.imagem))
+        return self.imagem.copy() if self.manter_original else self.imagem
+    
+    def _liberar_original(self):
+        # Com vários quadros a origem continua aberta: os demais são lidos ao salvar.
+        if (not self.manter_original and self.imagem is not None
+                and self._pil is not self.imagem and self.num_quadros == 1):
+            self.imagem.close()
+    
+    @property
+    def imagem_processada(self) -> Image.Image:
+        if self._pil is None:
+            self._pil = Image.fromarray(self._array)
+            self.copias += 1
+        return self._pil
+    
+    @imagem_processada.setter
+    def imagem_processada(self, imagem: Image.Image):
+        self._pil = imagem
+        self._array = None
+        self._liberar_original()
+    
+    def obter_array(self) -> np.ndarray:
+        """Retorna o buffer de trabalho como ndarray; não deve ser modificado in-place."""
+        if self._array is None:
+            self._array = np.asarray(self._pil)
+            self.copias += 1
+        return self._array
+    
+    def _definir_array(self, img_array: np.ndarray) -> np.ndarray:
+        self._array = img_array
+        self._pil = None
+        self._liberar_original()
+        return img_array
+    
+    def _usar_pool(self, imagem: Optional[Image.Image] = None) -> bool:
+        """Só vale sair do processo para imagens 8 bits grandes o bastante."""
+        if self.pool is None:
+            return False
+        if imagem is None and self._array is not None:
+            return self._array.dtype == np.uint8 and self._array.nbytes >= self.pool.min_bytes
+        if imagem is None:
+            imagem = self._pil
+        return (imagem.mode in ('L', 'RGB', 'RGBA')
+                and imagem.width * imagem.height * len(imagem.getbands()) >= self.pool.min_bytes)
+    
+    def aplicar_operacoes(self, operacoes: List[Tuple[str, Dict]]) -> 'ProcessadorImagem':
+        """
+        Aplica em sequência uma lista [(nome_do_metodo, parametros), ...].
+        Com `pool`, imagens grandes são processadas em um processo worker.
+        """
+        if not operacoes or not self._usar_pool() or self.perfil_memoria is not None:
+            for nome, parametros in operacoes:
+                getattr(self, nome)(**parametros)
+            return self
+        
+        operacoes = [(nome, (), parametros) for nome, parametros in operacoes]
+        self._definir_array(self.pool.aplicar(self.obter_array(), operacoes))
+        if self._operacoes is not None:
+            self._operacoes.extend(operacoes)
+        return self
+    
+    @_registrar_operacao
+    @_medir_memoria
+    def ajustar_brilho(self, fator: float) -> 'ProcessadorImagem':
         if fator < 0:
             raise ValueError("O fator de brilho deve ser >= 0")
         
         enhancer = ImageEnhance.Brightness(self.imagem_processada)
         self.imagem_processada = enhancer.enhance(fator)
-        return self.imagem_processada
+        return self
     
-    def ajustar_contraste(self, fator: float) -> Image.Image:
+    @_registrar_operacao
+    @_medir_memoria
+    def ajustar_contraste(self, fator: float) -> 'ProcessadorImagem':
         if fator < 0:
             raise ValueError("O fator de contraste deve ser >= 0")
         
         enhancer = ImageEnhance.Contrast(self.imagem_processada)
         self.imagem_processada = enhancer.enhance(fator)
-        return self.imagem_processada
+        return self
     
-    def ajustar_saturacao(self, fator: float) -> Image.Image:
+    @_registrar_operacao
+    @_medir_memoria
+    def ajustar_saturacao(self, fator: float) -> 'ProcessadorImagem':
         if fator < 0:
             raise ValueError("O fator de saturação deve ser >= 0")
         
         enhancer = ImageEnhance.Color(self.imagem_processada)
         self.imagem_processada = enhancer.enhance(fator)
-        return self.imagem_processada
+        return self
     
-    def ajustar_brilho_contraste(self, fator_brilho: float, fator_contraste: float) -> Image.Image:
+    @_registrar_operacao
+    @_medir_memoria
+    def ajustar_brilho_contraste(self, fator_brilho: float, fator_contraste: float) -> 'ProcessadorImagem':
         self.ajustar_brilho(fator_brilho)
         self.ajustar_contraste(fator_contraste)
-        return self.imagem_processada
+        return self
     
-    def ajuste_automatico(self) -> Image.Image:
-        img_array = np.array(self.imagem_processada)
+    @_registrar_operacao
+    @_medir_memoria
+    def ajuste_automatico(self, percentis: Optional[List[Tuple[float, float]]] = None) -> 'ProcessadorImagem':
+        """
+        Estica cada canal entre os percentis 2 e 98. `percentis` permite passar
+        (p2, p98) por canal já conhecidos, sem varrer os pixels para achá-los.
+        """
+        img_array = self.obter_array()
         
         if len(img_array.shape) == 3:
             img_rescaled = np.zeros_like(img_array)
+            img_rescaled[:, :, 3:] = img_array[:, :, 3:]
             for i in range(3):
-                p2, p98 = np.percentile(img_array[:, :, i], (2, 98))
+                p2, p98 = percentis[i] if percentis else percentis_canal(img_array[:, :, i], (2, 98))
                 
                 if p98 - p2 < 1:
                     img_rescaled[:, :, i] = img_array[:, :, i]
                 else:
-                    img_rescaled[:, :, i] = exposure.rescale_intensity(
-                        img_array[:, :, i], in_range=(p2, p98), out_range=(0, 255)
-                    )
+                    reescalar_canal(img_array[:, :, i], p2, p98, out=img_rescaled[:, :, i])
         else:
-            p2, p98 = np.percentile(img_array, (2, 98))
+            p2, p98 = percentis[0] if percentis else percentis_canal(img_array, (2, 98))
             if p98 - p2 < 1:
                 img_rescaled = img_array
             else:
-                img_rescaled = exposure.rescale_intensity(
-                    img_array, in_range=(p2, p98), out_range=(0, 255)
-                )
-        
-        img_rescaled = np.clip(img_rescaled, 0, 255).astype(np.uint8)
+                img_rescaled = reescalar_canal(img_array, p2, p98)
         
-        self.imagem_processada = Image.fromarray(img_rescaled)
-        return self.imagem_processada
+        self._definir_array(img_rescaled)
+        return self
     
-    def aplicar_clahe(self, clip_limit: float = 2.0, tile_grid_size: Tuple[int, int] = (8, 8)) -> Image.Image:
-        img_array = np.array(self.imagem_processada)
+    @_registrar_operacao
+    @_medir_memoria
+    def aplicar_clahe(self, clip_limit: float = 2.0, tile_grid_size: Tuple[int, int] = (8, 8)) -> 'ProcessadorImagem':
+        if clip_limit < 0:
+            raise ValueError("O clip_limit deve ser >= 0")
+        # Um tile de tamanho 0 derruba o processo no OpenCV (divisão por zero).
+        if len(tile_grid_size) != 2 or min(tile_grid_size) < 1:
+            raise ValueError("O tile_grid_size deve ter dois valores >= 1")
+        
+        import cv2
+        
+        img_array = self.obter_array()
         
         clahe = cv2.createCLAHE(clipLimit=clip_limit, tileGridSize=tile_grid_size)
         
         if len(img_array.shape) == 3:
-            img_lab = cv2.cvtColor(img_array, cv2.COLOR_RGB2LAB)
+            img_lab = cv2.cvtColor(img_array[:, :, :3], cv2.COLOR_RGB2LAB)
             img_lab[:, :, 0] = clahe.apply(img_lab[:, :, 0])
-            img_array = cv2.cvtColor(img_lab, cv2.COLOR_LAB2RGB)
+            img_rgb = cv2.cvtColor(img_lab, cv2.COLOR_LAB2RGB)
+            if img_array.shape[2] > 3:
+                img_rgb = np.dstack((img_rgb, img_array[:, :, 3:]))
+            img_array = img_rgb
         else:
             img_array = clahe.apply(img_array)
         
-        self.imagem_processada = Image.fromarray(img_array)
-        return self.imagem_processada
+        self._definir_array(img_array)
+        return self
     
-    def aplicar_curva_s(self, intensidade: float = 0.5) -> Image.Image:
-        img_array = np.array(self.imagem_processada).astype(np.float32) / 255.0
+    @_registrar_operacao
+    @_medir_memoria
+    def aplicar_curva_s(self, intensidade: float = 0.5) -> 'ProcessadorImagem':
+        img_array = self.obter_array()
         
-        def curva_s(x, intensidade):
-            centro = 0.5
-            if intensidade == 0:
-                return x
-            if x < centro:
-                return centro * np.power(x / centro, 1.0 / (1.0 + intensidade))
-            else:
-                return centro + (1.0 - centro) * np.power((x - centro) / (1.0 - centro), 1.0 + intensidade)
+        if img_array.dtype == np.uint8:
+            # Para 8 bits a curva vira uma tabela de 256 entradas: sem temporários float.
+            lut = (np.clip(curva_s(np.arange(256, dtype=np.float32) / 255.0, intensidade) * 255.0, 0, 255)
+                   .astype(np.uint8))
+            resultado = aplicar_lut(lut, img_array)
+            if len(img_array.shape) == 3 and img_array.shape[2] > 3:
+                resultado[:, :, 3:] = img_array[:, :, 3:]
+            self._definir_array(resultado)
+            return self
         
-        curva_s_vec = np.vectorize(curva_s)
-        
-        if len(img_array.shape) == 3:
+        img_float = img_array.astype(np.float32)
+        img_float /= 255.0
+        if len(img_float.shape) == 3:
             for i in range(3):
-                img_array[:, :, i] = curva_s_vec(img_array[:, :, i], intensidade)
+                img_float[:, :, i] = curva_s(img_float[:, :, i], intensidade)
         else:
-            img_array = curva_s_vec(img_array, intensidade)
+            img_float = curva_s(img_float, intensidade)
         
-        img_array = np.clip(img_array * 255.0, 0, 255).astype(np.uint8)
-        self.imagem_processada = Image.fromarray(img_array)
-        return self.imagem_processada
+        img_float *= 255.0
+        np.clip(img_float, 0, 255, out=img_float)
+        self._definir_array(img_float.astype(np.uint8))
+        return self
     
+    @_medir_memoria
     def gerar_histograma(self) -> Dict[str, List[int]]:
-        img_array = np.array(self.imagem_processada)
+        img_array = self.obter_array()
         histograma = {}
         
         if len(img_array.shape) == 3:
             cores = ['red', 'green', 'blue']
             for i, cor in enumerate(cores):
-                hist = cv2.calcHist([img_array], [i], None, [256], [0, 256])
-                histograma[cor] = hist.flatten().tolist()
+                histograma[cor] = contar_intensidades(img_array[:, :, i]).tolist()
         else:
-            hist = cv2.calcHist([img_array], [0], None, [256], [0, 256])
-            histograma['gray'] = hist.flatten().tolist()
+            histograma['gray'] = contar_intensidades(img_array).tolist()
         
         return histograma
     
+    def preparar_nivel(self, nivel: int) -> 'ProcessadorImagem':
+        """
+        Decodifica a imagem na resolução adequada ao nível. Depois disso
+        `gerar_tile` desse nível só lê a imagem e pode ser chamado de várias
+        threads ao mesmo tempo.
+        """
+        self._imagem_nivel(nivel)[0].load()
+        return self
+    
+    def _imagem_nivel(self, nivel: int) -> Tuple[Image.Image, int, int]:
+        largura, altura = self._tamanho
+        nivel_max = self._nivel_max
+        if not 0 <= nivel <= nivel_max:
+            raise ValueError(f"Nível fora do intervalo 0-{nivel_max}")
+        
+        escala = 2 ** (nivel_max - nivel)
+        largura_nivel = math.ceil(largura / escala)
+        altura_nivel = math.ceil(altura / escala)
+        
+        imagem = self.imagem_processada
+        if imagem is self.imagem and escala > 1 and imagem.format == 'JPEG':
+            imagem.draft(imagem.mode, (largura_nivel, altura_nivel))
+        return imagem, largura_nivel, altura_nivel
+    
+    def gerar_tile(self, nivel: int, x: int, y: int, tamanho_tile: int = 256) -> Image.Image:
+        """
+        Renderiza o tile (x, y) do nível `nivel` de uma pirâmide estilo Deep Zoom:
+        o nível `niveis_piramide(...) - 1` é a resolução original e cada nível
+        abaixo tem metade da largura e altura. Se o buffer de trabalho ainda é a
+        imagem original não decodificada, JPEGs são decodificados já reduzidos
+        (escala DCT), e só a região do tile é reamostrada.
+        """
+        imagem, largura_nivel, altura_nivel = self._imagem_nivel(nivel)
+        if not (0 <= x * tamanho_tile < largura_nivel and 0 <= y * tamanho_tile < altura_nivel):
+            raise ValueError("Tile fora da imagem")
+        
+        x0, y0 = x * tamanho_tile, y * tamanho_tile
+        x1 = min(x0 + tamanho_tile, largura_nivel)
+        y1 = min(y0 + tamanho_tile, altura_nivel)
+        
+        fator_x = imagem.width / largura_nivel
+        fator_y = imagem.height / altura_nivel
+        caixa = (x0 * fator_x, y0 * fator_y, min(x1 * fator_x, imagem.width), min(y1 * fator_y, imagem.height))
+        return imagem.resize((x1 - x0, y1 - y0), Image.Resampling.BILINEAR, box=caixa, reducing_gap=2.0)
+    
     def resetar(self):
-        self.imagem_processada = self.imagem.copy()
+        if self.manter_original:
+            self.imagem_processada = self._quadro_inicial()
+            if self._operacoes is not None:
+                self._operacoes = []
+        else:
+            self._array = None
+            self._carregar()
+        self.copias = 0
+    
+    def escolher_formato(self) -> str:
+        """
+        Escolhe WEBP para animações, PNG para imagens com transparência ou
+        poucas cores e JPEG para fotos.
+        """
+        if self.num_quadros > 1:
+            return 'WEBP'
+        
+        imagem = self.imagem_processada
+        if imagem.mode in ('RGBA', 'LA', 'PA') or 'transparency' in imagem.info:
+            return 'PNG'
+        if imagem.mode in ('P', '1'):
+            return 'PNG'
+        
+        amostra = imagem.reduce(max(1, max(imagem.size) // 256))
+        if amostra.getcolors(maxcolors=256) is not None:
+            return 'PNG'
+        return 'JPEG'
     
-    def salvar(self, caminho_saida: str):
+    def salvar(self, caminho_saida: str, perfil: Optional[str] = None,
+               formato: Optional[str] = None, **opcoes) -> dict:
+        """
+        Salva a imagem processada e retorna o caminho, formato, tamanho em bytes
+        e tempo de codificação. `perfil` ('rapido', 'balanceado', 'menor')
+        define os parâmetros do codificador; `formato='auto'` escolhe o formato
+        pelo conteúdo e troca a extensão de `caminho_saida`. Opções extras
+        (ex.: quality) têm precedência sobre o perfil.
+        """
         diretorio = os.path.dirname(caminho_saida)
         if diretorio and not os.path.exists(diretorio):
             os.makedirs(diretorio)
         
-        self.imagem_processada.save(caminho_saida)
-        print(f"Imagem salva em: {caminho_saida}")
+        if formato == 'auto':
+            formato = self.escolher_formato()
+            caminho_saida = os.path.splitext(caminho_saida)[0] + EXTENSOES_FORMATO[formato]
+        elif formato is None:
+            extensao = os.path.splitext(caminho_saida)[1].lower()
+            formato = Image.registered_extensions().get(extensao)
+        
+        relatorio = self._codificar(caminho_saida, formato, perfil, opcoes)
+        
+        relatorio['caminho'] = caminho_saida
+        relatorio['bytes'] = os.path.getsize(caminho_saida)
+        return relatorio
+    
+    def codificar(self, formato: str = 'PNG', perfil: Optional[str] = None, **opcoes) -> Tuple[bytes, dict]:
+        """Como `salvar`, mas codifica em memória e retorna (bytes, relatório)."""
+        if formato == 'auto':
+            formato = self.escolher_formato()
+        
+        buffer = io.BytesIO()
+        relatorio = self._codificar(buffer, formato, perfil, opcoes)
+        dados = buffer.getvalue()
+        relatorio['bytes'] = len(dados)
+        return dados, relatorio
+    
+    def _codificar(self, destino, formato: Optional[str], perfil: Optional[str], opcoes: dict) -> dict:
+        if perfil is not None and perfil not in PERFIS_CODIFICACAO:
+            raise ValueError(f"Perfil de codificação inválido: {perfil}")
+        if formato is not None:
+            formato = formato.upper().replace('JPG', 'JPEG')
+        
+        imagem = self.imagem_processada
+        if formato == 'JPEG' and imagem.mode not in ('RGB', 'L', 'CMYK'):
+            imagem = imagem.convert('RGB')
+        
+        parametros = {}
+        if perfil is not None:
+            parametros.update(PERFIS_CODIFICACAO[perfil].get(formato, {}))
+        parametros.update(opcoes)
+        
+        inicio = time.perf_counter()
+        if self.num_quadros > 1 and formato in FORMATOS_MULTIQUADRO:
+            quadros, parametros_animacao = self._quadros_processados(formato)
+            imagem = quadros[0]
+            parametros.update(parametros_animacao, append_images=quadros[1:], save_all=True)
+        imagem.save(destino, format=formato, **parametros)
+        tempo_ms = (time.perf_counter() - inicio) * 1000
+        
+        return {
+            'formato': formato,
+            'perfil': perfil,
+            'tempo_ms': round(tempo_ms, 2)
+        }
     
     def visualizar(self):
         self.imagem_processada.show()
@@ -145,10 +534,164 @@ class ProcessadorImagem:
         return {
             'formato': self.imagem.format,
             'modo': self.imagem.mode,
-            'tamanho': self.imagem.size,
-            'largura': self.imagem.width,
-            'altura': self.imagem.height
+            'tamanho': self._tamanho,
+            'largura': self._tamanho[0],
+            'altura': self._tamanho[1],
+            'quadros': self.num_quadros
         }
+    
+    def _quadros_processados(self, formato: str) -> Tuple[List[Image.Image], dict]:
+        """
+        Repete as operações registradas em todos os quadros e retorna a lista
+        de quadros e os parâmetros de animação (duração, loop) da origem.
+        Quadros idênticos são processados uma única vez e os distintos em
+        paralelo; o primeiro reaproveita o buffer de trabalho.
+        """
+        primeiro = self.imagem_processada
+        indices = []
+        unicos: Dict[bytes, int] = {}
+        fontes = []
+        duracoes = []
+        
+        with self._abrir() as origem:
+            modo = modo_quadros(origem)
+            loop = origem.info.get('loop')
+            for quadro in ImageSequence.Iterator(origem):
+                # A duração do quadro WebP só é preenchida após decodificá-lo.
+                quadro = quadro.convert(modo)
+                duracoes.append(origem.info.get('duration'))
+                chave = hashlib.blake2b(quadro.tobytes(), digest_size=16)
+                chave.update(f"{quadro.mode}{quadro.size}".encode())
+                chave = chave.digest()
+                if chave not in unicos:
+                    unicos[chave] = len(fontes)
+                    fontes.append(quadro)
+                indices.append(unicos[chave])
+        
+        operacoes = self._operacoes
+        
+        def processar(quadro: Image.Image) -> Image.Image:
+            processador = ProcessadorImagem._de_buffer(quadro)
+            for nome, args, kwargs in operacoes:
+                getattr(processador, nome)(*args, **kwargs)
+            return processador.imagem_processada
+        
+        resultados = [primeiro] + [None] * (len(fontes) - 1)
+        if len(fontes) > 1 and self._usar_pool(fontes[1]):
+            arrays = self.pool.aplicar_varios([np.asarray(quadro) for quadro in fontes[1:]], operacoes)
+            resultados[1:] = [Image.fromarray(array) for array in arrays]
+        elif len(fontes) > 1:
+            with ThreadPoolExecutor(max_workers=min(len(fontes) - 1, os.cpu_count() or 1)) as executor:
+                resultados[1:] = executor.map(processar, fontes[1:])
+        
+        parametros = {}
+        if any(duracao is not None for duracao in duracoes):
+            parametros['duration'] = [duracao or 0 for duracao in duracoes]
+        if loop is not None:
+            parametros['loop'] = loop
+        if formato == 'GIF' and primeiro.mode == 'RGBA':
+            # Os quadros decodificados já vêm compostos; sem restaurar o fundo,
+            # pixels transparentes mostrariam o quadro anterior.
+            parametros['disposal'] = 2
+        return [resultados[i] for i in indices], parametros
+
+
+def modo_quadros(imagem: Image.Image) -> str:
+    """Modo comum em que os quadros de uma imagem com vários quadros são processados."""
+    if imagem.mode in ('RGBA', 'LA', 'PA') or 'transparency' in imagem.info:
+        return 'RGBA'
+    if imagem.mode in ('L', 'RGB'):
+        return imagem.mode
+    return 'RGB'
+
+
+def reescalar_intensidade(canal: np.ndarray, p_min: float, p_max: float) -> np.ndarray:
+    """Equivalente em numpy de skimage.exposure.rescale_intensity para saída 0-255."""
+    canal_float = np.clip(canal.astype(np.float64), p_min, p_max)
+    canal_float -= p_min
+    canal_float /= p_max - p_min
+    canal_float *= 255.0
+    return canal_float.astype(np.uint8)
+
+
+def niveis_piramide(largura: int, altura: int) -> int:
+    """Quantidade de níveis da pirâmide: do 1x1 (nível 0) até a resolução original."""
+    return math.ceil(math.log2(max(largura, altura, 1))) + 1
+
+
+def percentis_canal(canal: np.ndarray, percentis) -> List[float]:
+    """
+    np.percentile (interpolação linear) sem ordenar o canal: para uint8 usa o
+    histograma acumulado, que dá o mesmo resultado com memória constante.
+    """
+    if canal.dtype != np.uint8:
+        return list(np.percentile(canal, percentis))
+    return percentis_histograma(contar_intensidades(canal), percentis)
+
+
+def percentis_histograma(histograma: np.ndarray, percentis) -> List[float]:
+    acumulado = np.cumsum(histograma)
+    total = int(acumulado[-1])
+    resultado = []
+    for percentil in percentis:
+        posicao = percentil / 100.0 * (total - 1)
+        inferior = int(np.floor(posicao))
+        superior = min(inferior + 1, total - 1)
+        valor_inferior = int(np.searchsorted(acumulado, inferior, side='right'))
+        valor_superior = int(np.searchsorted(acumulado, superior, side='right'))
+        resultado.append(valor_inferior + (valor_superior - valor_inferior) * (posicao - inferior))
+    return resultado
+
+
+def reescalar_canal(canal: np.ndarray, p_min: float, p_max: float, out: Optional[np.ndarray] = None) -> np.ndarray:
+    """`reescalar_intensidade` via tabela de consulta para uint8, gravando em `out` se dado."""
+    if canal.dtype != np.uint8:
+        resultado = reescalar_intensidade(canal, p_min, p_max)
+        if out is None:
+            return resultado
+        out[...] = resultado
+        return out
+    lut = reescalar_intensidade(np.arange(256, dtype=np.uint8), p_min, p_max)
+    return aplicar_lut(lut, canal, out=out)
+
+
+def aplicar_lut(lut: np.ndarray, img_array: np.ndarray, out: Optional[np.ndarray] = None) -> np.ndarray:
+    """
+    `lut[img_array]` em blocos de linhas: a indexação converte os índices para
+    intp (8x o tamanho), então o temporário fica limitado ao bloco.
+    """
+    if out is None:
+        out = np.empty(img_array.shape, dtype=lut.dtype)
+    linhas_por_bloco = max(1, (1 << 16) // max(1, img_array[0].size if img_array.ndim > 1 else img_array.size))
+    for inicio in range(0, img_array.shape[0], linhas_por_bloco):
+        fim = inicio + linhas_por_bloco
+        out[inicio:fim] = lut[img_array[inicio:fim]]
+    return out
+
+
+def curva_s(x: np.ndarray, intensidade: float) -> np.ndarray:
+    """Curva S em [0, 1]: escurece abaixo de 0.5 e clareia acima, conforme a intensidade."""
+    if intensidade == 0:
+        return x
+    centro = 0.5
+    return np.where(
+        x < centro,
+        centro * np.power(x / centro, 1.0 / (1.0 + intensidade)),
+        centro + (1.0 - centro) * np.power(np.maximum(x - centro, 0) / (1.0 - centro), 1.0 + intensidade)
+    )
+
+
+def contar_intensidades(canal: np.ndarray) -> np.ndarray:
+    if canal.dtype == np.uint8:
+        # bincount converte a entrada para intp (8x o tamanho); em blocos de
+        # linhas o temporário fica limitado a ~0,5 MB.
+        linhas_por_bloco = max(1, (1 << 16) // max(1, canal[0].size if canal.ndim > 1 else canal.size))
+        histograma = np.zeros(256, dtype=np.int64)
+        for inicio in range(0, canal.shape[0], linhas_por_bloco):
+            histograma += np.bincount(canal[inicio:inicio + linhas_por_bloco].ravel(), minlength=256)
+        return histograma
+    hist, _ = np.histogram(canal, bins=256, range=(0, 256))
+    return hist
 
 
 def ajustar_brilho_numpy(imagem_array: np.ndarray, fator: float) -> np.ndarray:
@@ -1,7 +1,18 @@
 """
 Script para iniciar o servidor da API
+
+Modo desenvolvimento (padrão): um processo com reload automático.
+Modo produção (--producao): N workers do uvicorn, sem reload, com backlog e
+keep-alive configuráveis. Todo o estado compartilhado entre workers (imagens,
+saídas e locks) fica em disco, em temp/.
+
+Uso:
+    python start_api.py
+    python start_api.py --producao --workers 8
 """
 
+import argparse
+import os
 import uvicorn
 import sys
 from pathlib import Path
@@ -9,20 +20,52 @@ from pathlib import Path
 # Adiciona o diretório src ao path
 sys.path.insert(0, str(Path(__file__).parent / 'src'))
 
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Inicia a API de Processamento de Imagens")
+    parser.add_argument('--producao', action='store_true', help="Modo produção com múltiplos workers")
+    parser.add_argument('--host', default=os.environ.get('API_HOST', '0.0.0.0'))
+    parser.add_argument('--port', type=int, default=int(os.environ.get('API_PORT', 8000)))
+    parser.add_argument('--workers', type=int, default=int(os.environ.get('API_WORKERS', os.cpu_count() or 1)),
+                        help="Número de processos worker (modo produção)")
+    parser.add_argument('--backlog', type=int, default=int(os.environ.get('API_BACKLOG', 2048)),
+                        help="Tamanho da fila de conexões pendentes")
+    parser.add_argument('--keep-alive', type=int, default=int(os.environ.get('API_KEEP_ALIVE', 5)),
+                        help="Timeout de keep-alive em segundos")
+    return parser.parse_args()
+
+
 if __name__ == "__main__":
+    args = parse_args()
+
     print("=" * 60)
     print("🚀 Iniciando API de Processamento de Imagens")
     print("=" * 60)
-    print("\n📍 Servidor: http://localhost:8000")
-    print("📚 Documentação: http://localhost:8000/docs")
-    print("📖 ReDoc: http://localhost:8000/redoc")
+    print(f"\n📍 Servidor: http://localhost:{args.port}")
+    print(f"📚 Documentação: http://localhost:{args.port}/docs")
+    print(f"📖 ReDoc: http://localhost:{args.port}/redoc")
+    if args.producao:
+        print(f"⚙️  Modo produção: {args.workers} workers")
     print("\n💡 Pressione Ctrl+C para parar o servidor\n")
     print("=" * 60 + "\n")
-    
-    uvicorn.run(
-        "src.api:app",
-        host="0.0.0.0",
-        port=8000,
-        reload=True,
-        log_level="info"
-    )
+
+    if args.producao:
+        # Lido pela API para dividir os núcleos do pool de processos entre os workers.
+        os.environ['API_WORKERS'] = str(args.workers)
+        uvicorn.run(
+            "src.api:app",
+            host=args.host,
+            port=args.port,
+            workers=args.workers,
+            backlog=args.backlog,
+            timeout_keep_alive=args.keep_alive,
+            log_level="info"
+        )
+    else:
+        uvicorn.run(
+            "src.api:app",
+            host=args.host,
+            port=args.port,
+            reload=True,
+            log_level="info"
+        )
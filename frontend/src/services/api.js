@@ -79,6 +79,28 @@ class ImageProcessingAPI {
     return `${API_BASE_URL}/download/${imageId}?processed=${processed}`;
   }
 
+  async getTilesInfo(imageId, processed = false) {
+    try {
+      const response = await fetch(
+        `${API_BASE_URL}/tiles/${imageId}/info?processed=${processed}`
+      );
+
+      if (!response.ok) {
+        const error = await response.json();
+        throw new Error(error.detail || 'Erro ao obter pirâmide de tiles');
+      }
+
+      return await response.json();
+    } catch (error) {
+      console.error('Erro ao obter pirâmide de tiles:', error);
+      throw error;
+    }
+  }
+
+  getTileUrl(imageId, level, x, y, processed = false, format = 'jpeg') {
+    return `${API_BASE_URL}/tiles/${imageId}/${level}/${x}/${y}?processed=${processed}&format=${format}`;
+  }
+
   async getImageInfo(imageId) {
     try {
       const response = await fetch(`${API_BASE_URL}/info/${imageId}`);